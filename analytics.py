@@ -0,0 +1,113 @@
+from collections import namedtuple
+
+import numpy as np
+
+from moods import MAX_SCORE, MIN_SCORE
+
+WEEKDAYS = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")
+MONTHS = ("Янв", "Фев", "Мар", "Апр", "Май", "Июн", "Июл", "Авг", "Сен", "Окт", "Ноя", "Дек")
+
+# Оценки пользователя: days - номера дней от 1970-01-01 (int32, по возрастанию),
+# scores - оценки соответствующих записей (int8)
+MoodSeries = namedtuple('MoodSeries', ['days', 'scores'])
+
+# Средняя оценка по каждому календарному дню от первой до последней записи;
+# в днях без записей count равен 0, а mean - NaN
+DailySeries = namedtuple('DailySeries', ['first_day', 'sums', 'counts', 'mean'])
+
+
+def load_series(db, user_id):
+    # Загружает оценки пользователя из таблицы mood_counts: строк в ней не больше,
+    # чем дней, умноженных на число настроений, а каждая оценка повторяется count раз.
+    rows = db.get_mood_counts(user_id)
+    if not rows:
+        return MoodSeries(np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int8))
+    dates, scores, counts = zip(*rows)
+    counts = np.array(counts, dtype=np.int64)
+    days = np.array(dates, dtype='datetime64[D]').astype(np.int32)
+    return MoodSeries(np.repeat(days, counts), np.repeat(np.array(scores, dtype=np.int8), counts))
+
+
+def daily(series):
+    # Сворачивает записи в плотный ряд по дням (суммы и количества через bincount).
+    if len(series.days) == 0:
+        empty = np.zeros(0)
+        return DailySeries(0, empty, empty.astype(np.int64), empty)
+    first_day = int(series.days.min())
+    offsets = series.days - first_day
+    sums = np.bincount(offsets, weights=series.scores)
+    counts = np.bincount(offsets)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / counts
+    return DailySeries(first_day, sums, counts, mean)
+
+
+def rolling_mean(day_series, window):
+    # Скользящее среднее оценок за последние window календарных дней
+    # (по всем записям окна, а не по средним дней). NaN, если в окне нет записей.
+    sum_cum = np.concatenate(([0.0], np.cumsum(day_series.sums)))
+    count_cum = np.concatenate(([0], np.cumsum(day_series.counts)))
+    end = np.arange(1, len(day_series.sums) + 1)
+    start = np.maximum(end - window, 0)
+    sums = sum_cum[end] - sum_cum[start]
+    counts = count_cum[end] - count_cum[start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def _grouped_mean(groups, scores, size):
+    sums = np.bincount(groups, weights=scores, minlength=size)
+    counts = np.bincount(groups, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def weekday_profile(series):
+    # Средняя оценка по дням недели (понедельник - 0). 1970-01-01 был четвергом.
+    return _grouped_mean((series.days + 3) % 7, series.scores, 7)
+
+
+def month_profile(series):
+    # Средняя оценка по месяцам года (январь - 0).
+    months = series.days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12
+    return _grouped_mean(months, series.scores, 12)
+
+
+def longest_streak(mask):
+    # Длина самой длинной серии подряд идущих True в массиве.
+    if not mask.any():
+        return 0
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return int((ends - starts).max())
+
+
+def streaks(day_series):
+    # Самые длинные серии дней подряд с положительной и отрицательной средней оценкой.
+    # День без записей прерывает серию.
+    mean = np.nan_to_num(day_series.mean, nan=0.0)
+    return longest_streak(mean > 0), longest_streak(mean < 0)
+
+
+def distribution(series):
+    # Количество записей для каждой оценки от MIN_SCORE до MAX_SCORE.
+    return np.bincount(series.scores.astype(np.int64) - MIN_SCORE, minlength=MAX_SCORE - MIN_SCORE + 1)
+
+
+def summarize(series):
+    # Считает все показатели для окна статистики.
+    day_series = daily(series)
+    positive, negative = streaks(day_series)
+    return {
+        'entries': len(series.scores),
+        'mean': float(series.scores.mean()) if len(series.scores) else float('nan'),
+        'daily': day_series,
+        'rolling_7': rolling_mean(day_series, 7),
+        'rolling_30': rolling_mean(day_series, 30),
+        'weekdays': weekday_profile(series),
+        'months': month_profile(series),
+        'positive_streak': positive,
+        'negative_streak': negative,
+        'distribution': distribution(series),
+    }
@@ -0,0 +1,171 @@
+import argparse
+import hashlib
+import lzma
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import date
+
+# Архивация старых лет: записи за год переносятся из основной базы в отдельный
+# файл SQLite, сжатый lzma (archive/moods_<год>.db.xz рядом с базой). Основной
+# файл остается небольшим, а история и экспорт читают архивы через ATTACH
+# (см. Database.moods_source). Дневные счетчики mood_counts для графика и
+# статистики остаются в основной базе; полнотекстовый поиск идет только по
+# неархивированным записям.
+#
+# SQLite подключает к соединению не больше 10 баз, поэтому файлов архива не
+# больше MAX_ARCHIVE_FILES: когда они заканчиваются, следующий год дописывается
+# в архив ближайшего по времени года, и один файл хранит несколько лет.
+#
+# Запуск: python archive.py archive ГОД [ГОД ...] [--vacuum]
+#         python archive.py list
+
+ARCHIVE_DIR = 'archive'
+CACHE_DIR = '.cache'  # распакованные копии архивов, внутри ARCHIVE_DIR
+BATCH_SIZE = 10_000
+MAX_ARCHIVE_FILES = 8  # запас до ограничения SQLite в 10 подключенных баз
+COLUMNS = "id, user_id, mood_id, comment, question_answer, date"
+
+ARCHIVE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS moods (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    mood_id INTEGER NOT NULL,
+    comment TEXT,
+    question_answer TEXT,
+    date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_moods_user_date ON moods (user_id, date, id);
+'''
+
+
+def archive_directory(db):
+    return os.path.join(os.path.dirname(os.path.abspath(db.path)), ARCHIVE_DIR)
+
+
+def archive_name(year):
+    return f"moods_{year}.db.xz"
+
+
+def decompress(source, target):
+    # Распаковывает архив в новый файл target, доступный только владельцу.
+    with lzma.open(source) as src, open(os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as dst:
+        shutil.copyfileobj(src, dst)
+
+
+def cached_copy(path):
+    # Распакованная копия архива в закрытом каталоге archive/.cache рядом с ним;
+    # распаковывается один раз для каждой версии файла архива, копии прежних
+    # версий удаляются.
+    stat = os.stat(path)
+    directory = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    os.chmod(directory, 0o700)
+    key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+    name = f"{key}_{stat.st_size}_{stat.st_mtime_ns}.db"
+    target = os.path.join(directory, name)
+    if not os.path.exists(target):
+        partial = target + ".part"
+        decompress(path, partial)
+        os.replace(partial, target)
+        for old in os.listdir(directory):
+            if old.startswith(f"{key}_") and old != name:
+                try:
+                    os.remove(os.path.join(directory, old))
+                except OSError:
+                    pass  # Копия еще открыта в другом процессе (Windows)
+    return target
+
+
+def target_file(archives, year):
+    # Файл архива для года year: тот, где год уже лежит, новый файл, если
+    # лимит файлов не исчерпан, иначе файл ближайшего по времени года.
+    files = {}
+    for archived_year, file, *_ in archives:
+        if archived_year == year:
+            return file
+        files.setdefault(file, archived_year)
+    if len(files) < MAX_ARCHIVE_FILES:
+        return archive_name(year)
+    return min(archives, key=lambda row: (abs(row[0] - year), row[0]))[1]
+
+
+def archive_year(db, year):
+    # Переносит записи за год year в архив (дополняя существующий архив) и
+    # удаляет их из основной базы. Возвращает число перенесенных записей.
+    if year >= date.today().year:
+        raise ValueError("Архивировать можно только прошедшие годы")
+    start, end = f"{year:04d}-01-01", f"{year:04d}-12-31"
+    directory = archive_directory(db)
+    os.makedirs(directory, exist_ok=True)
+    name = target_file(db.get_archives(), year)
+    path = os.path.join(directory, name)
+
+    # Записи, добавленные во время архивации, не трогаем: их id больше max_id
+    max_id = db.fetchone("SELECT COALESCE(MAX(id), 0) FROM moods")[0]
+    rows = db.connection().execute(f"SELECT {COLUMNS} FROM moods WHERE date BETWEEN ? AND ? AND id <= ?",
+                                   (start, end, max_id))
+    with tempfile.TemporaryDirectory(dir=directory) as work:
+        work_file = os.path.join(work, "moods.db")
+        if os.path.exists(path):
+            decompress(path, work_file)
+        archive = sqlite3.connect(work_file)
+        try:
+            archive.executescript(ARCHIVE_SCHEMA)
+            count = 0
+            with archive:
+                while batch := rows.fetchmany(BATCH_SIZE):
+                    archive.executemany(f"INSERT INTO moods ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)", batch)
+                    count += len(batch)
+            if count == 0:
+                return 0
+            total = archive.execute("SELECT COUNT(*) FROM moods WHERE date BETWEEN ? AND ?",
+                                    (start, end)).fetchone()[0]
+            archive.execute("VACUUM")
+        finally:
+            archive.close()
+
+        compressed = os.path.join(work, name)
+        with open(work_file, "rb") as src, lzma.open(compressed, "wb", preset=9) as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(compressed, path)
+
+    # Архив записан: только теперь удаляем записи из основной базы
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM moods WHERE date BETWEEN ? AND ? AND id <= ?", (start, end, max_id))
+        conn.execute("INSERT INTO archives (year, file, entries, created_at) VALUES (?, ?, ?, datetime('now')) "
+                     "ON CONFLICT (year) DO UPDATE SET file = excluded.file, entries = excluded.entries, "
+                     "created_at = excluded.created_at", (year, name, total))
+    return count
+
+
+def main(argv=None):
+    from database import db
+
+    parser = argparse.ArgumentParser(description="Архивация записей дневника настроения за прошедшие годы.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("archive", help="перенести записи за годы в архив")
+    command.add_argument("years", type=int, nargs="+")
+    command.add_argument("--vacuum", action="store_true", help="сжать основную базу после переноса")
+    commands.add_parser("list", help="показать архивы")
+    args = parser.parse_args(argv)
+
+    db.create_tables()
+    if args.command == "list":
+        for year, file, entries, created_at in db.get_archives():
+            print(f"{year}\t{entries}\t{file}\t{created_at}")
+        return
+
+    for year in args.years:
+        try:
+            count = archive_year(db, year)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            parser.exit(1, f"Ошибка ({year}): {e}\n")
+        print(f"{year}: перенесено записей: {count}")
+    if args.vacuum:
+        db.vacuum()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Замер скорости модуля analytics на синтетических данных: загрузка оценок
+# пользователя из временной базы (load_series) и расчеты NumPy.
+# Запуск из корня проекта: python -m benchmarks.bench_analytics [число записей]
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import analytics
+import moods
+from database import Database
+
+BATCH_SIZE = 100_000
+
+
+def synthesize(entries, years=5, seed=0):
+    # Случайные записи за years лет: в среднем несколько записей в день.
+    rng = np.random.default_rng(seed)
+    first_day = 19000
+    days = np.sort(rng.integers(first_day, first_day + 365 * years, entries, dtype=np.int32))
+    scores = rng.integers(analytics.MIN_SCORE, analytics.MAX_SCORE + 1, entries, dtype=np.int8)
+    return analytics.MoodSeries(days, scores)
+
+
+def build_database(path, series):
+    # Временная база со схемой приложения, в которой все записи series принадлежат одному пользователю.
+    db = Database(path)
+    db.create_tables()
+    db.execute("INSERT INTO users (username, password) VALUES ('benchmark', '')")
+    user_id = db.get_user_id("benchmark")
+    codes = {mood.score: mood.code for mood in moods.MOODS}
+    dates = series.days.astype('datetime64[D]').astype(str)
+    with db.transaction() as conn:
+        for start in range(0, len(dates), BATCH_SIZE):
+            db.insert_moods(conn, [(user_id, codes[int(score)], "", "", day) for day, score in
+                                   zip(dates[start:start + BATCH_SIZE], series.scores[start:start + BATCH_SIZE])])
+    return db, user_id
+
+
+def timed(name, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{name:<20} {(time.perf_counter() - start) * 1000:8.2f} мс")
+    return result
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    series = synthesize(entries)
+    print(f"Записей: {entries}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        db, user_id = build_database(os.path.join(directory, "bench.db"), series)
+        print(f"{'подготовка базы':<20} {time.perf_counter() - start:8.2f} с")
+        loaded = timed("load_series", analytics.load_series, db, user_id)
+        db.close()
+    assert np.array_equal(loaded.days, series.days)
+
+    day_series = timed("daily", analytics.daily, series)
+    timed("rolling_mean 7", analytics.rolling_mean, day_series, 7)
+    timed("rolling_mean 30", analytics.rolling_mean, day_series, 30)
+    timed("weekday_profile", analytics.weekday_profile, series)
+    timed("month_profile", analytics.month_profile, series)
+    timed("streaks", analytics.streaks, day_series)
+    timed("distribution", analytics.distribution, series)
+    timed("summarize (всё)", analytics.summarize, series)
+
+
+if __name__ == "__main__":
+    main()
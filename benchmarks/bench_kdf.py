@@ -0,0 +1,34 @@
+# Замер стоимости хэширования паролей и подбор параметров под целевое время входа.
+# Запуск из корня проекта: python -m benchmarks.bench_kdf [целевое время, мс]
+import sys
+
+import credentials
+
+
+def main():
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 100.0
+
+    print("Текущие параметры:", credentials.DEFAULT_PARAMS,
+          f"{credentials.measure(credentials.DEFAULT_PARAMS) * 1000:.1f} мс")
+    print()
+
+    if hasattr(credentials.hashlib, 'scrypt'):
+        for power in range(12, 18):
+            params = {'algorithm': 'scrypt', 'n': 2 ** power, 'r': 8, 'p': 1}
+            print(f"scrypt n=2^{power:<3} {credentials.measure(params) * 1000:8.1f} мс")
+    for iterations in (100_000, 300_000, 600_000, 1_000_000):
+        params = {'algorithm': 'pbkdf2_sha256', 'iterations': iterations}
+        print(f"pbkdf2 {iterations:>9} {credentials.measure(params, rounds=1) * 1000:8.1f} мс")
+    print()
+
+    params, elapsed = credentials.calibrate(target_ms / 1000)
+    print(f"Рекомендуемые параметры для {target_ms:.0f} мс:", params, f"({elapsed * 1000:.1f} мс)")
+    print()
+    print("Чтобы применить их, добавьте в config.ini:")
+    print("[security]")
+    for name, value in params.items():
+        print(f"{name} = {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# Нагрузочный замер основных операций дневника на синтетической базе:
+# вход, добавление записи, загрузка истории, данные графика и вопрос дня.
+# Для каждого размера (всего записей) создается отдельная временная база с
+# users пользователями, записи которых распределены по years годам.
+# Результаты печатаются в формате JSON; с --baseline печатается и сравнение
+# с сохраненным ранее результатом.
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_service [--sizes 1000 100000 1000000] [--output result.json]
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import credentials
+import moods
+from database import Database
+from questions import QuestionScheduler
+from service import DiaryService
+
+PASSWORD = "benchmark"
+WORDS = ("сегодня", "работа", "учеба", "друзья", "семья", "прогулка", "экзамен", "спорт", "кино",
+         "дождь", "солнце", "устал", "выспался", "встреча", "книга", "музыка", "дорога", "праздник")
+BATCH_SIZE = 10_000
+
+
+def synthesize_rows(user_ids, entries, years, seed=0):
+    # Генератор строк для moods: entries записей, поровну у каждого пользователя,
+    # даты равномерно за последние years лет, примерно треть записей без комментария.
+    rng = random.Random(seed)
+    codes = [mood.code for mood in moods.MOODS]
+    first_day = (date.today() - timedelta(days=365 * years)).toordinal()
+    span = 365 * years
+    per_user, extra = divmod(entries, len(user_ids))
+    for index, user_id in enumerate(user_ids):
+        count = per_user + (index < extra)
+        for day in sorted(rng.randrange(span) for _ in range(count)):
+            comment = " ".join(rng.choices(WORDS, k=rng.randint(2, 8))) if rng.random() > 0.3 else ""
+            answer = " ".join(rng.choices(WORDS, k=rng.randint(1, 5))) if rng.random() > 0.5 else ""
+            yield user_id, rng.choice(codes), comment, answer, date.fromordinal(first_day + day).isoformat()
+
+
+def build_database(path, users, entries, years):
+    # Создает базу со схемой приложения и синтетическими данными; возвращает (db, id пользователей).
+    db = Database(path)
+    db.create_tables()
+    # Все пользователи получают один и тот же хэш: хэширование не входит в подготовку данных
+    password_hash = credentials.hash_password(PASSWORD)
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO users (username, password) VALUES (?, ?)",
+                         ((f"user{number}", password_hash) for number in range(users)))
+    user_ids = [row[0] for row in db.fetchall("SELECT id FROM users ORDER BY id")]
+
+    rows = synthesize_rows(user_ids, entries, years)
+    with db.transaction() as conn:
+        while batch := [row for _, row in zip(range(BATCH_SIZE), rows)]:
+            db.insert_moods(conn, batch)
+    db.connection().execute("ANALYZE")
+    db.connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")  # чтобы размер файла отражал все данные
+    return db, user_ids
+
+
+def measure(func, repeat):
+    # Время вызовов func в миллисекундах: медиана, минимум и максимум.
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(times), "min_ms": min(times), "max_ms": max(times), "runs": repeat}
+
+
+def walk_history(db, user_id, page_size=100):
+    # Проходит всю историю пользователя постранично, как при прокрутке таблицы.
+    before = None
+    while page := db.get_history_page(user_id, before, page_size):
+        before = (page[-1][1], page[-1][0])
+
+
+def bench_size(directory, entries, users, years, repeat):
+    path = os.path.join(directory, f"bench_{entries}.db")
+    start = time.perf_counter()
+    db, user_ids = build_database(path, users, entries, years)
+    build_seconds = time.perf_counter() - start
+
+    scheduler = QuestionScheduler(db)
+    service = DiaryService(db, scheduler, credentials.LoginRateLimiter())
+    user_id = user_ids[0]
+    day_numbers = iter(range(date.today().toordinal(), date.today().toordinal() + repeat * 1000))
+
+    results = {
+        "entries": entries,
+        "users": users,
+        "entries_per_user": entries // users,
+        "build_seconds": build_seconds,
+        "db_size_mb": os.path.getsize(path) / 2 ** 20,
+        "login": measure(lambda: service.login("user0", PASSWORD), min(repeat, 5)),
+        # Запросы к базе без кэша результатов и отдельно - повторные вызовы через кэш сервиса
+        "history_first_page": measure(lambda: db.get_history_page(user_id), repeat),
+        "history_first_page_cached": measure(lambda: service.history(user_id), repeat),
+        "history_full_walk": measure(lambda: walk_history(db, user_id), max(repeat // 10, 1)),
+        "plot_data": measure(lambda: db.get_daily_means(user_id), repeat),
+        "plot_data_cached": measure(lambda: service.plot_data(user_id), repeat),
+        "daily_question": measure(
+            lambda: scheduler.question_for(user_id, date.fromordinal(next(day_numbers))), repeat),
+        "daily_question_cached": measure(lambda: scheduler.question_for(user_id), repeat),
+    }
+
+    # Добавление записей по одной (как кнопка "Сохранить"): каждая - своя транзакция
+    inserts = repeat * 10
+    start = time.perf_counter()
+    for number in range(inserts):
+        service.add_entry(user_ids[number % users], moods.MOODS[number % len(moods.MOODS)].code,
+                          "замер скорости", "")
+    elapsed = time.perf_counter() - start
+    results["save_mood"] = {"inserts": inserts, "per_second": inserts / elapsed,
+                            "mean_ms": elapsed * 1000 / inserts}
+
+    # Поток записей без ожидания каждой (скрипты, сервер): очередь пишет их пачками
+    inserts = repeat * 200
+    start = time.perf_counter()
+    for number in range(inserts):
+        service.queue_entry(user_ids[number % users], moods.MOODS[number % len(moods.MOODS)].code,
+                            "замер скорости", "")
+    service.flush()
+    elapsed = time.perf_counter() - start
+    results["save_mood_queued"] = {"inserts": inserts, "per_second": inserts / elapsed,
+                                   "mean_ms": elapsed * 1000 / inserts}
+    service.close()
+
+    db.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return results
+
+
+def compare(results, baseline):
+    # Печатает изменение медиан относительно baseline (отрицательное - быстрее).
+    previous = {run["entries"]: run for run in baseline["runs"]}
+    for run in results["runs"]:
+        old = previous.get(run["entries"])
+        if old is None:
+            continue
+        print(f"Записей: {run['entries']}", file=sys.stderr)
+        for name, value in run.items():
+            if isinstance(value, dict) and "median_ms" in value and name in old:
+                change = (value["median_ms"] / old[name]["median_ms"] - 1) * 100
+                print(f"  {name:<24} {old[name]['median_ms']:10.3f} -> {value['median_ms']:10.3f} мс "
+                      f"({change:+.1f}%)", file=sys.stderr)
+        for name in ("save_mood", "save_mood_queued"):
+            if name in old and name in run:
+                change = (run[name]["per_second"] / old[name]["per_second"] - 1) * 100
+                print(f"  {name + ', записей/с':<24} {old[name]['per_second']:10.0f} -> "
+                      f"{run[name]['per_second']:10.0f} ({change:+.1f}%)", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер скорости операций дневника на синтетических данных.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000],
+                        help="общее число записей в базе для каждого замера")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=50, help="повторов каждого замера")
+    parser.add_argument("--output", help="записать JSON в файл вместо вывода на экран")
+    parser.add_argument("--baseline", help="JSON предыдущего запуска для сравнения")
+    args = parser.parse_args(argv)
+
+    results = {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for entries in args.sizes:
+            print(f"Записей: {entries}...", file=sys.stderr)
+            results["runs"].append(bench_size(directory, entries, args.users, args.years, args.repeat))
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
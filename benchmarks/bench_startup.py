@@ -0,0 +1,49 @@
+# Замер холодного старта: время импорта nactr и время до показа окна входа.
+# Каждый замер выполняется в отдельном процессе, чтобы не было кэша импортов.
+# Запуск из корня проекта: python -m benchmarks.bench_startup [число запусков]
+import json
+import statistics
+import subprocess
+import sys
+
+# Код, выполняемый в дочернем процессе; печатает замеры в формате JSON
+PROBE = r'''
+import json, sys, time
+start = time.perf_counter()
+import nactr
+imported = time.perf_counter()
+from PyQt6 import QtCore, QtWidgets
+app = QtWidgets.QApplication(sys.argv)
+nactr.prepare_startup(app)
+window = nactr.MoodDiaryApp()
+window.show()
+
+def shown():
+    print(json.dumps({
+        "import": imported - start,
+        "first_window": time.perf_counter() - start,
+        "heavy_modules_loaded": [name for name in ("matplotlib", "numpy") if name in sys.modules],
+    }))
+    app.quit()
+
+QtCore.QTimer.singleShot(0, shown)
+app.exec()
+'''
+
+
+def run_once():
+    output = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [run_once() for _ in range(runs)]
+    print(f"Запусков: {runs}")
+    print(f"Импорт nactr:        {statistics.median(r['import'] for r in results) * 1000:8.1f} мс (медиана)")
+    print(f"До показа окна:      {statistics.median(r['first_window'] for r in results) * 1000:8.1f} мс (медиана)")
+    print("Загружены при старте:", ", ".join(results[-1]['heavy_modules_loaded']) or "-")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+# Кэш результатов запросов по пользователям. Ключ включает версию данных
+# пользователя из базы (users.data_version), которую триггеры увеличивают при
+# каждом изменении его записей, в том числе из другого процесса: после новой
+# записи старые результаты больше не находятся и вытесняются сами.
+# Размер ограничен числом результатов и суммарным числом строк в них (LRU).
+
+MAX_ENTRIES = 512
+MAX_ROWS = 200_000
+
+
+def weight(value):
+    # "Вес" результата для ограничения размера: число строк списка или 1.
+    return len(value) if isinstance(value, (list, tuple)) else 1
+
+
+class SummaryCache:
+
+    def __init__(self, load_version, max_entries=MAX_ENTRIES, max_rows=MAX_ROWS):
+        self.load_version = load_version  # функция user_id -> текущая версия данных в базе
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._items = OrderedDict()  # (user_id, версия, вид, аргументы) -> (значение, вес)
+        self._versions = {}  # последняя увиденная версия каждого пользователя
+        self._rows = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._rows = 0
+
+    def get(self, user_id, kind, args, compute):
+        # Результат compute() из кэша или вычисленный заново. Версия читается
+        # до вычисления, поэтому результат не может оказаться старше своей версии.
+        version = self.load_version(user_id)
+        key = (user_id, version, kind, args)
+        with self._lock:
+            if self._versions.get(user_id) != version:
+                # Данные изменились: результаты прежних версий больше не понадобятся
+                self._versions[user_id] = version
+                for old in [old for old in self._items if old[0] == user_id and old[1] != version]:
+                    self._rows -= self._items.pop(old)[1]
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+
+        value = compute()
+        size = weight(value)
+        with self._lock:
+            if self._versions.get(user_id) == version and size <= self.max_rows and key not in self._items:
+                self._items[key] = (value, size)
+                self._rows += size
+                while len(self._items) > self.max_entries or self._rows > self.max_rows:
+                    self._rows -= self._items.popitem(last=False)[1][1]
+        return value
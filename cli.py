@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import getpass
+import sys
+from datetime import date
+
+from service import service, DiaryError
+
+# Командная строка дневника настроения; работает без PyQt6.
+# Запуск: python cli.py <команда> ... (список команд - python cli.py -h)
+
+
+def read_password(args):
+    return args.password if args.password is not None else getpass.getpass("Пароль: ")
+
+
+def cmd_register(args):
+    print(f"Пользователь зарегистрирован, id: {service.register(args.username, read_password(args))}")
+
+
+def cmd_login(args):
+    print(f"Вход выполнен, id: {service.login(args.username, read_password(args))}")
+
+
+def cmd_add(args):
+    entry_date = date.fromisoformat(args.date) if args.date else None
+    entry_id = service.add_entry(service.user_id(args.username), service.mood_code(args.mood),
+                                 args.comment, args.answer, entry_date)
+    print(f"Запись добавлена, id: {entry_id}")
+
+
+def cmd_history(args):
+    for _, entry_date, mood, comment in service.history(service.user_id(args.username), limit=args.limit):
+        print(f"{entry_date}\t{mood}\t{comment}")
+
+
+def cmd_plot_data(args):
+    for entry_date, mean in service.plot_data(service.user_id(args.username)):
+        print(f"{entry_date}\t{mean:.2f}")
+
+
+def cmd_question(args):
+    print(service.daily_question(service.user_id(args.username)) or "Нет доступного вопроса на сегодня.")
+
+
+def cmd_serve(args):
+    import server
+
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Дневник настроения без графического интерфейса.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, func, help_text in (("register", cmd_register, "зарегистрировать пользователя"),
+                                  ("login", cmd_login, "проверить логин и пароль")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("username")
+        command.add_argument("--password", help="пароль (по умолчанию запрашивается)")
+        command.set_defaults(func=func)
+
+    command = commands.add_parser("add", help="добавить запись о настроении")
+    command.add_argument("username")
+    command.add_argument("mood", help="код или название настроения")
+    command.add_argument("--comment", default="")
+    command.add_argument("--answer", default="", help="ответ на вопрос дня")
+    command.add_argument("--date", help="дата ГГГГ-ММ-ДД (по умолчанию сегодня)")
+    command.set_defaults(func=cmd_add)
+
+    command = commands.add_parser("history", help="последние записи пользователя")
+    command.add_argument("username")
+    command.add_argument("--limit", type=int, default=20)
+    command.set_defaults(func=cmd_history)
+
+    for name, func, help_text in (("plot-data", cmd_plot_data, "средняя оценка по дням"),
+                                  ("question", cmd_question, "вопрос дня пользователя")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("username")
+        command.set_defaults(func=func)
+
+    command = commands.add_parser("serve", help="запустить локальный HTTP-сервер")
+    command.add_argument("--host", default="127.0.0.1")
+    command.add_argument("--port", type=int, default=8765)
+    command.set_defaults(func=cmd_serve)
+
+    args = parser.parse_args(argv)
+    service.prepare()
+    try:
+        args.func(args)
+    except (DiaryError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
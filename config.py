@@ -1,3 +1,91 @@
-[User]
-login = null
-password = null
\ No newline at end of file
+import configparser
+import os
+import re
+from collections import namedtuple
+
+# Настройки приложения из config.ini. Файл читается один раз при импорте
+# модуля; отсутствующие параметры берутся из значений по умолчанию.
+# Другой файл настроек можно указать в переменной окружения MOOD_DIARY_CONFIG.
+
+CONFIG_PATH = os.environ.get('MOOD_DIARY_CONFIG', 'config.ini')
+
+# Настройки, применяемые к каждому новому соединению с базой
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',  # читатели не блокируют писателя
+    'synchronous': 'NORMAL',  # в режиме WAL fsync только при checkpoint
+    'foreign_keys': 'ON',
+    'temp_store': 'MEMORY',
+    'cache_size': '-8000',  # около 8 МБ страничного кэша
+    'busy_timeout': '5000',  # ждем блокировку до 5 секунд вместо ошибки
+}
+
+Settings = namedtuple('Settings', [
+    'database_path',  # файл базы данных
+    'cached_statements',  # размер кэша подготовленных запросов на соединение
+    'pragmas',  # словарь PRAGMA -> значение
+    'cache_max_entries',  # ограничения кэша результатов (см. cache.py)
+    'cache_max_rows',
+    'diagnostics_enabled',  # встроенные замеры (см. instrumentation.py)
+    'slow_query_ms',
+    'session_enabled',  # можно ли запоминать вход
+    'session_days',  # срок действия запомненного входа
+    'session_file',  # файл с токеном запомненного входа
+    'password_hash',  # параметры хэширования паролей или None (см. credentials.py)
+])
+
+
+def _pragmas(parser):
+    # PRAGMA по умолчанию с поправками из секции [pragmas]. Имена и значения
+    # подставляются в SQL, поэтому допускаются только простые слова и числа.
+    pragmas = dict(DEFAULT_PRAGMAS)
+    if parser.has_section('pragmas'):
+        pragmas.update(parser.items('pragmas'))
+    for name, value in pragmas.items():
+        if not re.fullmatch(r"\w+", name) or not re.fullmatch(r"-?[\w.]+", value):
+            raise ValueError(f"Недопустимая настройка PRAGMA в {CONFIG_PATH}: {name} = {value}")
+    return pragmas
+
+
+def _password_hash(parser):
+    # Параметры хэширования паролей из секции [security]. Если алгоритм не
+    # задан, возвращается None и credentials.py использует свои значения.
+    algorithm = parser.get('security', 'algorithm', fallback=None)
+    if algorithm is None:
+        return None
+    if algorithm == 'scrypt':
+        params = {
+            'algorithm': algorithm,
+            'n': parser.getint('security', 'n', fallback=2 ** 14),
+            'r': parser.getint('security', 'r', fallback=8),
+            'p': parser.getint('security', 'p', fallback=1),
+        }
+        if params['n'] < 2 or params['n'] & (params['n'] - 1):
+            raise ValueError(f"Параметр n в секции [security] {CONFIG_PATH} должен быть степенью двойки")
+    elif algorithm == 'pbkdf2_sha256':
+        params = {'algorithm': algorithm, 'iterations': parser.getint('security', 'iterations', fallback=600_000)}
+    else:
+        raise ValueError(f"Неизвестный алгоритм хэширования в {CONFIG_PATH}: {algorithm}")
+    if any(value < 1 for name, value in params.items() if name != 'algorithm'):
+        raise ValueError(f"Параметры хэширования в {CONFIG_PATH} должны быть положительными")
+    return params
+
+
+def load(path=CONFIG_PATH):
+    parser = configparser.ConfigParser()
+    parser.read(path, encoding='utf-8')
+    return Settings(
+        database_path=parser.get('database', 'path', fallback='mood_diary.db'),
+        cached_statements=parser.getint('database', 'cached_statements', fallback=128),
+        pragmas=_pragmas(parser),
+        cache_max_entries=parser.getint('cache', 'max_entries', fallback=512),
+        cache_max_rows=parser.getint('cache', 'max_rows', fallback=200_000),
+        diagnostics_enabled=parser.getboolean('diagnostics', 'enabled', fallback=False),
+        slow_query_ms=parser.getfloat('diagnostics', 'slow_query_ms', fallback=100.0),
+        session_enabled=parser.getboolean('session', 'enabled', fallback=True),
+        session_days=parser.getint('session', 'days', fallback=30),
+        session_file=parser.get('session', 'file', fallback='session.token'),
+        password_hash=_password_hash(parser),
+    )
+
+
+settings = load()
@@ -0,0 +1,212 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import defaultdict, deque
+
+from config import settings
+
+# Хэш пароля хранится одной строкой вместе с алгоритмом и параметрами, поэтому
+# у каждого пользователя могут быть свои параметры:
+#   scrypt$<n>$<r>$<p>$<соль>$<хэш>
+#   pbkdf2_sha256$<итерации>$<соль>$<хэш>
+# Старые записи - несоленый sha256 в hex - проверяются и при входе перехэшируются.
+# Параметры для новых хэшей задаются в секции [security] config.ini (подобрать
+# их под машину можно командой python -m benchmarks.bench_kdf); хэши с другими
+# параметрами пересчитываются при следующем входе.
+
+SALT_SIZE = 16
+HASH_SIZE = 32
+
+if hasattr(hashlib, 'scrypt'):
+    BUILTIN_PARAMS = {'algorithm': 'scrypt', 'n': 2 ** 14, 'r': 8, 'p': 1}
+else:  # Python собран без scrypt (старый OpenSSL)
+    BUILTIN_PARAMS = {'algorithm': 'pbkdf2_sha256', 'iterations': 600_000}
+
+if settings.password_hash and (settings.password_hash['algorithm'] != 'scrypt' or hasattr(hashlib, 'scrypt')):
+    DEFAULT_PARAMS = settings.password_hash
+else:
+    DEFAULT_PARAMS = BUILTIN_PARAMS
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def _derive(password, salt, params):
+    # Вычисляет ключ из пароля по алгоритму и параметрам из params.
+    if params['algorithm'] == 'scrypt':
+        n, r, p = params['n'], params['r'], params['p']
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p, dklen=HASH_SIZE)
+    if params['algorithm'] == 'pbkdf2_sha256':
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, params['iterations'], dklen=HASH_SIZE)
+    raise ValueError(f"Неизвестный алгоритм хэширования: {params['algorithm']}")
+
+
+def hash_password(password, params=None):
+    # Возвращает строку с солью, параметрами и хэшем пароля.
+    params = params or DEFAULT_PARAMS
+    salt = os.urandom(SALT_SIZE)
+    digest = _derive(password, salt, params)
+    if params['algorithm'] == 'scrypt':
+        fields = [params['algorithm'], params['n'], params['r'], params['p']]
+    else:
+        fields = [params['algorithm'], params['iterations']]
+    return "$".join(str(field) for field in fields + [_b64encode(salt), _b64encode(digest)])
+
+
+def parse_hash(stored):
+    # Разбирает сохраненную строку: (параметры, соль, хэш). Для старого sha256 параметры - None.
+    if "$" not in stored:
+        return None, b"", bytes.fromhex(stored)
+    algorithm, *fields = stored.split("$")
+    if algorithm == 'scrypt':
+        n, r, p, salt, digest = fields
+        params = {'algorithm': algorithm, 'n': int(n), 'r': int(r), 'p': int(p)}
+    elif algorithm == 'pbkdf2_sha256':
+        iterations, salt, digest = fields
+        params = {'algorithm': algorithm, 'iterations': int(iterations)}
+    else:
+        raise ValueError(f"Неизвестный алгоритм хэширования: {algorithm}")
+    return params, base64.b64decode(salt), base64.b64decode(digest)
+
+
+def verify_password(password, stored):
+    # Проверяет пароль за постоянное время относительно содержимого хэша.
+    params, salt, digest = parse_hash(stored)
+    if params is None:
+        candidate = hashlib.sha256(password.encode()).digest()
+    else:
+        candidate = _derive(password, salt, params)
+    return hmac.compare_digest(candidate, digest)
+
+
+def needs_rehash(stored, params=None):
+    # True, если хэш получен не с текущими параметрами и его стоит пересчитать.
+    return parse_hash(stored)[0] != (params or DEFAULT_PARAMS)
+
+
+# Хэш для несуществующих пользователей: проверка занимает столько же времени,
+# и по задержке нельзя узнать, зарегистрировано ли имя
+_DUMMY_HASH = None
+
+
+def authenticate(db, username, password):
+    # Проверяет логин и пароль; возвращает id пользователя или None.
+    # Устаревший хэш при успешном входе прозрачно заменяется на новый.
+    global _DUMMY_HASH
+    row = db.get_password_hash(username)
+    if row is None:
+        if _DUMMY_HASH is None:
+            _DUMMY_HASH = hash_password("")
+        verify_password(password, _DUMMY_HASH)
+        return None
+
+    user_id, stored = row
+    if not verify_password(password, stored):
+        return None
+    if needs_rehash(stored):
+        db.set_password_hash(user_id, hash_password(password))
+    return user_id
+
+
+def create_user(db, username, password):
+    # Регистрирует пользователя; при занятом имени поднимает sqlite3.IntegrityError.
+    return db.add_user(username, hash_password(password))
+
+
+def hash_token(token):
+    # Токен сессии случайный и длинный, поэтому медленный хэш ему не нужен.
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_session(db, user_id, days):
+    # Запоминает вход на days дней; возвращает токен (в базе остается только его хэш).
+    token = secrets.token_urlsafe(32)
+    db.add_session(hash_token(token), user_id, days)
+    return token
+
+
+def resume_session(db, token):
+    # id пользователя по токену или None, если вход не запомнен или срок истек.
+    return db.get_session_user(hash_token(token)) if token else None
+
+
+def end_session(db, token):
+    # Забывает вход (заодно удаляются истекшие сессии).
+    db.delete_session(hash_token(token))
+
+
+class LoginRateLimiter:
+    # Ограничение неудачных попыток входа: после max_attempts ошибок за window
+    # секунд вход для этого имени блокируется до истечения окна. Хранится в памяти.
+
+    def __init__(self, max_attempts=5, window=300):
+        self.max_attempts = max_attempts
+        self.window = window
+        self._failures = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def _prune(self, failures, now):
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+
+    def retry_after(self, username):
+        # Сколько секунд осталось до следующей разрешенной попытки (0 - можно входить).
+        now = time.monotonic()
+        with self._lock:
+            failures = self._failures.get(username)
+            if not failures:
+                return 0
+            self._prune(failures, now)
+            if len(failures) < self.max_attempts:
+                return 0
+            return failures[0] + self.window - now
+
+    def record_failure(self, username):
+        now = time.monotonic()
+        with self._lock:
+            failures = self._failures[username]
+            self._prune(failures, now)
+            failures.append(now)
+
+    def reset(self, username):
+        with self._lock:
+            self._failures.pop(username, None)
+
+
+login_limiter = LoginRateLimiter()
+
+
+def measure(params, password="benchmark", rounds=3):
+    # Среднее время одного хэширования с параметрами params, в секундах.
+    salt = os.urandom(SALT_SIZE)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        _derive(password, salt, params)
+    return (time.perf_counter() - start) / rounds
+
+
+def calibrate(target_seconds=0.1, algorithm=None):
+    # Подбирает наибольшую стоимость, при которой хэширование на этой машине
+    # укладывается в target_seconds. Возвращает параметры и измеренное время.
+    algorithm = algorithm or DEFAULT_PARAMS['algorithm']
+    if algorithm == 'scrypt':
+        params = {'algorithm': 'scrypt', 'n': 2 ** 10, 'r': 8, 'p': 1}
+        elapsed = measure(params)
+        while True:
+            candidate = dict(params, n=params['n'] * 2)
+            candidate_elapsed = measure(candidate)
+            if candidate_elapsed > target_seconds:
+                return params, elapsed
+            params, elapsed = candidate, candidate_elapsed
+
+    # Время PBKDF2 линейно по числу итераций: экстраполируем по короткому замеру
+    probe = {'algorithm': 'pbkdf2_sha256', 'iterations': 50_000}
+    iterations = int(probe['iterations'] * target_seconds / measure(probe))
+    params = {'algorithm': 'pbkdf2_sha256', 'iterations': max(iterations, 10_000)}
+    return params, measure(params)
@@ -0,0 +1,332 @@
+import os
+import pathlib
+import re
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+
+from config import settings
+import instrumentation
+import migrations
+
+DB_PATH = settings.database_path
+
+# Настройки, применяемые к каждому новому соединению (см. [pragmas] в config.ini)
+PRAGMAS = tuple(f"PRAGMA {name}={value}" for name, value in settings.pragmas.items())
+
+# Маркеры начала и конца найденного слова в результатах поиска
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+
+def fts_query(text):
+    # Превращает введенный текст в безопасный запрос FTS5: каждое слово ищется
+    # как префикс ("экзамен" найдет и "экзамены"), все слова должны встретиться.
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+class _ConnectionHolder:
+    # Соединение потока в threading.local. Объект удаляется вместе с данными
+    # потока, когда поток завершается, и тогда соединение закрывается.
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+class ConnectionPool:
+    # Пул долгоживущих соединений: по одному соединению на поток. Соединение
+    # закрывается, когда его поток завершается (например, поток QThreadPool,
+    # простоявший без задач), и при close_all().
+
+    def __init__(self, database, cached_statements=settings.cached_statements):
+        self.database = database
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _open(self):
+        # Открывает новое соединение и применяет настройки.
+        conn = sqlite3.connect(self.database, cached_statements=self.cached_statements, check_same_thread=False,
+                               factory=instrumentation.connection_factory(), uri=True)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def get(self):
+        # Возвращает соединение текущего потока, создавая его при первом обращении.
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            conn = self._open()
+            holder = self._local.holder = _ConnectionHolder(conn)
+            weakref.finalize(holder, self._release, conn)
+        return holder.conn
+
+    def _release(self, conn):
+        # Закрывает соединение завершившегося потока.
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+
+    def close_all(self):
+        # Закрывает все открытые пулом соединения.
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class Database:
+    # Единый объект доступа к данным дневника.
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.pool = ConnectionPool(path)
+        self._attached = threading.local()  # (соединение, список архивов, имена ATTACH) этого потока
+
+    def connection(self):
+        return self.pool.get()
+
+    @contextmanager
+    def transaction(self):
+        # Выполняет блок в одной транзакции: commit при успехе, rollback при ошибке.
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def execute(self, sql, params=()):
+        # Выполняет запрос (кэшированный подготовленный оператор) и фиксирует изменения.
+        with self.transaction() as conn:
+            return conn.execute(sql, params)
+
+    def fetchone(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    def close(self):
+        self.pool.close_all()
+
+    def vacuum(self):
+        self.connection().execute("VACUUM")
+
+    def create_tables(self):
+        # Создает таблицы и доводит схему базы данных до актуальной версии.
+        return migrations.migrate(self.connection())
+
+    # --- Пользователи ---
+
+    def get_password_hash(self, username):
+        # Возвращает (id, хэш пароля) пользователя или None.
+        return self.fetchone("SELECT id, password FROM users WHERE username=?", (username,))
+
+    def get_user_id(self, username):
+        row = self.fetchone("SELECT id FROM users WHERE username=?", (username,))
+        return row[0] if row else None
+
+    def get_data_version(self, user_id):
+        # Версия данных пользователя: растет при каждом изменении его записей (см. migrations.data_versions).
+        row = self.fetchone("SELECT data_version FROM users WHERE id=?", (user_id,))
+        return row[0] if row else 0
+
+    def get_users(self):
+        # Все пользователи: строки (id, username).
+        return self.fetchall("SELECT id, username FROM users ORDER BY id")
+
+    def set_password_hash(self, user_id, password_hash):
+        self.execute("UPDATE users SET password=? WHERE id=?", (password_hash, user_id))
+
+    def add_user(self, username, hashed_password):
+        # Добавляет пользователя; при повторном имени поднимает sqlite3.IntegrityError.
+        return self.execute("INSERT INTO users (username, password) VALUES (?, ?)",
+                            (username, hashed_password)).lastrowid
+
+    # --- Записи о настроении ---
+
+    def add_mood(self, user_id, mood_id, comment, answer, date):
+        # Добавляет запись отдельной транзакцией; дневные счетчики обновляет триггер moods_counts_insert.
+        with self.transaction() as conn:
+            return self.insert_mood(conn, (user_id, mood_id, comment, answer, date))
+
+    def insert_mood(self, conn, row):
+        # Вставка одной строки (user_id, mood_id, comment, question_answer, date)
+        # в уже открытой транзакции conn; возвращает id записи.
+        return conn.execute("INSERT INTO moods (user_id, mood_id, comment, question_answer, date) "
+                            "VALUES (?, ?, ?, ?, ?)", row).lastrowid
+
+    def insert_moods(self, conn, rows):
+        # Пакетная вставка строк (user_id, mood_id, comment, question_answer, date)
+        # в уже открытой транзакции conn.
+        conn.executemany("INSERT INTO moods (user_id, mood_id, comment, question_answer, date) "
+                         "VALUES (?, ?, ?, ?, ?)", rows)
+
+    def iter_moods(self, user_id):
+        # Генератор всех записей пользователя (date, mood, comment, question_answer)
+        # по порядку дат; строки читаются из курсора по мере обхода.
+        yield from self.connection().execute(
+            f"SELECT m.date, t.label, m.comment, m.question_answer FROM {self.moods_source()} m "
+            "JOIN mood_types t ON t.code = m.mood_id WHERE m.user_id=? ORDER BY m.date, m.id", (user_id,))
+
+    def search_moods(self, user_id, text, mood_id=None, start=None, end=None, limit=50, offset=0):
+        # Полнотекстовый поиск по комментариям и ответам пользователя, лучшие совпадения первыми.
+        # Возвращает строки (id, date, mood, фрагмент с выделенными словами).
+        query = fts_query(text)
+        if not query:
+            return []
+        sql = ("SELECT m.id, m.date, t.label, "
+               f"snippet(moods_fts, -1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 24) "
+               "FROM moods_fts JOIN moods m ON m.id = moods_fts.rowid JOIN mood_types t ON t.code = m.mood_id "
+               "WHERE moods_fts MATCH ? AND m.user_id = ?")
+        params = [query, user_id]
+        if mood_id is not None:
+            sql += " AND m.mood_id = ?"
+            params.append(mood_id)
+        if start is not None:
+            sql += " AND m.date >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND m.date <= ?"
+            params.append(end)
+        sql += " ORDER BY bm25(moods_fts), m.date DESC LIMIT ? OFFSET ?"
+        return self.fetchall(sql, params + [limit, offset])
+
+    def get_mood_codes(self):
+        # Словарь "название настроения -> код" из справочника mood_types.
+        return dict(self.fetchall("SELECT label, code FROM mood_types"))
+
+    def get_mood_scores(self):
+        # Словарь "название настроения -> оценка" из справочника mood_types.
+        return dict(self.fetchall("SELECT label, score FROM mood_types"))
+
+    def get_history_page(self, user_id, before=None, limit=100):
+        # Страница истории от новых записей к старым. before - ключ (date, id)
+        # последней уже загруженной записи; выборка идет по индексу, поэтому
+        # стоимость страницы не зависит от числа записей пользователя.
+        # Архивы подключаются, только если страница доходит до архивных лет.
+        rows = self._history_page("moods", user_id, before, limit)
+        archives = self.get_archives()
+        if not archives or (len(rows) == limit and rows[-1][1] > f"{archives[-1][0]:04d}-12-31"):
+            return rows
+        return self._history_page(self.moods_source(archives), user_id, before, limit)
+
+    def _history_page(self, table, user_id, before, limit):
+        if before is None:
+            return self.fetchall(f"SELECT m.id, m.date, t.label, m.comment FROM {table} m "
+                                 "JOIN mood_types t ON t.code = m.mood_id WHERE m.user_id=? "
+                                 "ORDER BY m.date DESC, m.id DESC LIMIT ?", (user_id, limit))
+        return self.fetchall(f"SELECT m.id, m.date, t.label, m.comment FROM {table} m "
+                             "JOIN mood_types t ON t.code = m.mood_id WHERE m.user_id=? AND (m.date, m.id) < (?, ?) "
+                             "ORDER BY m.date DESC, m.id DESC LIMIT ?", (user_id, before[0], before[1], limit))
+
+    def get_daily_means(self, user_id):
+        # Средняя оценка настроения по дням (одна строка на день) из дневных счетчиков mood_counts.
+        return self.fetchall("SELECT c.date, CAST(SUM(t.score * c.count) AS REAL) / SUM(c.count) "
+                             "FROM mood_counts c JOIN mood_types t ON t.code = c.mood_id "
+                             "WHERE c.user_id=? GROUP BY c.date ORDER BY c.date", (user_id,))
+
+    def get_moods_between(self, user_id, start, end):
+        # Записи пользователя за период [start, end]; даты в формате ISO "ГГГГ-ММ-ДД".
+        return self.fetchall(f"SELECT m.date, t.label, m.comment FROM {self.moods_source()} m "
+                             "JOIN mood_types t ON t.code = m.mood_id "
+                             "WHERE m.user_id=? AND m.date BETWEEN ? AND ? ORDER BY m.date, m.id", (user_id, start, end))
+
+    def get_mood_counts(self, user_id):
+        # Число записей по дням и оценкам: строки (date, score, count) по возрастанию даты,
+        # включая архивные годы.
+        return self.fetchall("SELECT c.date, t.score, c.count FROM mood_counts c "
+                             "JOIN mood_types t ON t.code = c.mood_id WHERE c.user_id=? ORDER BY c.date",
+                             (user_id,))
+
+    # --- Архивы ---
+
+    def get_archives(self):
+        # Архивы по годам: строки (year, file, entries, created_at).
+        return self.fetchall("SELECT year, file, entries, created_at FROM archives ORDER BY year")
+
+    def moods_source(self, archives=None):
+        # Имя таблицы для чтения записей вместе с архивами: "moods", если архивов
+        # нет, иначе временное представление all_moods. Файлы архивов подключаются
+        # к соединению текущего потока (ATTACH, только чтение) при первом обращении;
+        # их не больше archive.MAX_ARCHIVE_FILES, так что лимит SQLite в 10
+        # подключенных баз не превышается.
+        archives = self.get_archives() if archives is None else archives
+        if not archives:
+            return "moods"
+        import archive  # lzma, shutil и tempfile нужны только при наличии архивов
+        conn = self.connection()
+        attached = getattr(self._attached, 'state', None)
+        if attached is None or attached[:2] != (conn, archives):
+            if attached is not None and attached[0] is conn:
+                self._detach_archives(conn, attached[2])
+            self._attached.state = None
+            files = list(dict.fromkeys(file for _, file, *_ in archives))
+            aliases = []
+            try:
+                selects = [f"SELECT {archive.COLUMNS} FROM main.moods"]
+                for index, file in enumerate(files):
+                    path = archive.cached_copy(os.path.join(archive.archive_directory(self), file))
+                    uri = f"{pathlib.Path(path).as_uri()}?mode=ro"
+                    conn.execute(f"ATTACH DATABASE ? AS archive_{index}", (uri,))
+                    aliases.append(f"archive_{index}")
+                    selects.append(f"SELECT {archive.COLUMNS} FROM archive_{index}.moods")
+                conn.execute("DROP VIEW IF EXISTS temp.all_moods")
+                conn.execute("CREATE TEMP VIEW all_moods AS " + " UNION ALL ".join(selects))
+            except Exception:
+                # Не оставляем соединение наполовину подключенным: следующий вызов начнет заново
+                self._detach_archives(conn, aliases)
+                raise
+            self._attached.state = (conn, archives, aliases)
+        return "all_moods"
+
+    def _detach_archives(self, conn, aliases):
+        conn.execute("DROP VIEW IF EXISTS temp.all_moods")
+        for alias in aliases:
+            conn.execute(f"DETACH DATABASE {alias}")
+
+    # --- Запомненные входы ---
+
+    def add_session(self, token_hash, user_id, days):
+        self.execute("INSERT INTO sessions (token_hash, user_id, created_at, expires_at) "
+                     "VALUES (?, ?, datetime('now'), datetime('now', ?))", (token_hash, user_id, f"+{days} days"))
+
+    def get_session_user(self, token_hash):
+        # id пользователя по хэшу токена или None, если токен неизвестен или истек.
+        row = self.fetchone("SELECT user_id FROM sessions WHERE token_hash=? AND expires_at > datetime('now')",
+                            (token_hash,))
+        return row[0] if row else None
+
+    def delete_session(self, token_hash):
+        self.execute("DELETE FROM sessions WHERE token_hash=? OR expires_at <= datetime('now')", (token_hash,))
+
+    # --- Черновики ---
+
+    def save_draft(self, user_id, mood_id, comment, answer):
+        self.execute("INSERT INTO drafts (user_id, mood_id, comment, question_answer, updated_at) "
+                     "VALUES (?, ?, ?, ?, datetime('now')) ON CONFLICT (user_id) DO UPDATE SET "
+                     "mood_id = excluded.mood_id, comment = excluded.comment, "
+                     "question_answer = excluded.question_answer, updated_at = excluded.updated_at",
+                     (user_id, mood_id, comment, answer))
+
+    def get_draft(self, user_id):
+        # Черновик пользователя (mood_id, comment, question_answer) или None.
+        return self.fetchone("SELECT mood_id, comment, question_answer FROM drafts WHERE user_id=?", (user_id,))
+
+    def delete_draft(self, user_id):
+        self.execute("DELETE FROM drafts WHERE user_id=?", (user_id,))
+
+    # --- Вопросы дня ---
+
+    def get_questions(self):
+        # Все вопросы дня (id, текст) в порядке id.
+        return self.fetchall("SELECT id, question FROM questions ORDER BY id")
+
+
+db = Database()
@@ -0,0 +1,199 @@
+import functools
+import json
+import logging
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+from config import settings
+
+# Встроенные замеры: гистограммы времени операций интерфейса и фоновых задач,
+# число и время SQL-запросов, журнал медленных запросов. Включаются в config.ini
+# (см. config.py):
+#
+#   [diagnostics]
+#   enabled = true
+#   slow_query_ms = 100
+#
+# Когда замеры выключены, соединения с базой создаются обычными, а обертки
+# функций только проверяют флаг.
+
+SLOW_QUERY_MS = 100.0
+MAX_SLOW_QUERIES = 100
+
+log = logging.getLogger("mood_diary.instrumentation")
+
+
+class Histogram:
+    # Гистограмма длительностей в миллисекундах с логарифмическими корзинами.
+
+    BOUNDS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS) + 1)  # Последняя корзина - больше 10 с
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.buckets[bisect_left(self.BOUNDS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction):
+        # Верхняя граница корзины, в которую попадает заданная доля замеров.
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= fraction * self.count:
+                return self.BOUNDS[index] if index < len(self.BOUNDS) else self.max
+        return 0.0
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": self.max,
+            "buckets": {f"<={bound}": count for bound, count in zip(self.BOUNDS, self.buckets) if count},
+        }
+
+
+class Metrics:
+
+    def __init__(self, enabled=False, slow_query_ms=SLOW_QUERY_MS):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.timings = {}  # имя операции -> Histogram
+        self.queries = {}  # текст запроса -> Histogram
+        self.slow_queries = deque(maxlen=MAX_SLOW_QUERIES)
+        self._sql_keys = {}  # исходный текст запроса -> текст без лишних пробелов
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            histogram = self.timings.get(name)
+            if histogram is None:
+                histogram = self.timings[name] = Histogram()
+            histogram.add(seconds * 1000)
+
+    def record_query(self, sql, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            key = self._sql_keys.get(sql)
+            if key is None:
+                key = self._sql_keys[sql] = " ".join(sql.split())
+            histogram = self.queries.get(key)
+            if histogram is None:
+                histogram = self.queries[key] = Histogram()
+            histogram.add(ms)
+            if ms >= self.slow_query_ms:
+                self.slow_queries.append({"time": time.time(), "ms": ms, "sql": key})
+        if ms >= self.slow_query_ms:
+            log.warning("Медленный запрос (%.1f мс): %s", ms, key)
+
+    @contextmanager
+    def timer(self, name):
+        # Замеряет время блока with под именем name.
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        # Декоратор: замеряет время каждого вызова функции под именем name.
+        # Слоты, подключенные к clicked, дополнительно оборачиваются в
+        # QtCore.pyqtSlot(), чтобы PyQt не передавал им аргумент checked.
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self.timings.clear()
+            self.queries.clear()
+            self.slow_queries.clear()
+
+    def snapshot(self):
+        # Все замеры в виде словаря для JSON.
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "slow_query_ms": self.slow_query_ms,
+                "timings": {name: histogram.to_dict() for name, histogram in sorted(self.timings.items())},
+                "queries": {sql: histogram.to_dict() for sql, histogram in
+                            sorted(self.queries.items(), key=lambda item: -item[1].total)},
+                "slow_queries": list(self.slow_queries),
+            }
+
+    def export(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.snapshot(), file, ensure_ascii=False, indent=2)
+
+
+metrics = Metrics(settings.diagnostics_enabled, settings.slow_query_ms)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    # Соединение, замеряющее execute, executemany и commit. Для SELECT время
+    # execute включает выполнение запроса до первой строки результата.
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.record_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            metrics.record_query(sql, time.perf_counter() - start)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            metrics.record_query("COMMIT", time.perf_counter() - start)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # "with conn:" фиксирует транзакцию, не вызывая commit(), поэтому замеряем и его
+        start = time.perf_counter()
+        try:
+            return super().__exit__(exc_type, exc_value, traceback)
+        finally:
+            if exc_type is None:
+                metrics.record_query("COMMIT", time.perf_counter() - start)
+
+
+def connection_factory():
+    # Класс соединения для sqlite3.connect: с замерами или обычный.
+    return InstrumentedConnection if metrics.enabled else sqlite3.Connection
+
+
+def task_name(func):
+    # Имя функции фоновой задачи для замеров (в том числе для functools.partial).
+    func = getattr(func, "func", func)
+    return getattr(func, "__qualname__", repr(func))
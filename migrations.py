@@ -0,0 +1,378 @@
+# Миграции схемы базы данных. Версия схемы хранится в PRAGMA user_version:
+# миграция с номером N (по порядку в MIGRATIONS, начиная с 1) применяется,
+# если user_version < N, после чего user_version становится равной N.
+import os
+import pathlib
+import sqlite3
+
+import moods
+
+# Вопросы дня, добавляемые при создании таблиц
+QUESTIONS = [
+    "Что сегодня сделало вас счастливым?",
+    "Какое ваше главное достижение сегодня?",
+    "Что вы могли бы улучшить в своем дне?",
+    "Какое ваше любимое воспоминание?",
+    "Что вас сегодня вдохновляет?",
+    "Как вам погода сегодня на улице?",
+    "Что вызывало у вас радость сегодня?",
+    "Что новое вы узнали за сегодня?",
+    "Что вам сегодня снилось?",
+    "Из-за чего вы сегодня расстраивались?",
+    "Что сегодня вас заставило улыбнуться?",
+    "Какая сегодняшняя ситуация запоминалась вам?",
+    "Что сегодня удивило?",
+    "Какой урок вы извлекли из сегодняшнего дня?",
+    "Какая часть вашего дня была самой продуктивной?",
+    "Чем вы гордитесь в конце дня?"
+]
+
+
+def initial_schema(conn):
+    # Создает исходные таблицы (для уже существующих баз ничего не меняет).
+    # Создание таблицы пользователей
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL
+    )
+    ''')
+
+    # Создание таблицы настроений
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS moods (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        mood TEXT NOT NULL,
+        comment TEXT,
+        question_answer TEXT,
+        date TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+
+    # Создание таблицы вопросов
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS questions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        question TEXT NOT NULL,
+        date TEXT NOT NULL UNIQUE
+    )
+    ''')
+
+    # Добавление вопросов, если их еще нет
+    conn.executemany("INSERT OR IGNORE INTO questions (question, date) VALUES (?, '')",
+                     [(question,) for question in QUESTIONS])
+
+
+def iso_dates(conn):
+    # Переводит даты записей из "ДД-ММ-ГГГГ" в ISO-8601 "ГГГГ-ММ-ДД" и добавляет
+    # индекс (user_id, date), покрывающий выборки истории и графика пользователя.
+    conn.execute('''
+    UPDATE moods
+    SET date = substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2)
+    WHERE date GLOB '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]'
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_moods_user_date ON moods (user_id, date, mood)")
+
+
+def history_keyset_index(conn):
+    # Перестраивает индекс как (user_id, date, id): постраничная выборка истории
+    # по ключу (date, id) идет прямо по индексу, без сортировки остатка таблицы.
+    conn.execute("DROP INDEX IF EXISTS idx_moods_user_date")
+    conn.execute("CREATE INDEX idx_moods_user_date ON moods (user_id, date, id)")
+
+
+def daily_aggregates(conn):
+    # Добавляет таблицу дневных агрегатов (число записей и сумма оценок за день)
+    # и заполняет ее по уже существующим записям.
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS mood_daily (
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        score_sum INTEGER NOT NULL,
+        PRIMARY KEY (user_id, date)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE TEMP TABLE mood_scores (mood TEXT PRIMARY KEY, score INTEGER NOT NULL)")
+    conn.executemany("INSERT INTO mood_scores VALUES (?, ?)", [(mood.label, mood.score) for mood in moods.MOODS])
+    conn.execute('''
+    INSERT OR REPLACE INTO mood_daily (user_id, date, count, score_sum)
+    SELECT m.user_id, m.date, COUNT(*), SUM(COALESCE(s.score, 0))
+    FROM moods m LEFT JOIN mood_scores s ON s.mood = m.mood
+    GROUP BY m.user_id, m.date
+    ''')
+    conn.execute("DROP TABLE temp.mood_scores")
+
+
+def mood_catalogue(conn):
+    # Выносит настроения в справочник mood_types: записи хранят код настроения
+    # вместо текста. Дневные агрегаты теперь обновляет триггер на вставку.
+    conn.execute('''
+    CREATE TABLE mood_types (
+        code INTEGER PRIMARY KEY,
+        label TEXT NOT NULL UNIQUE,
+        description TEXT NOT NULL DEFAULT '',
+        score INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    conn.executemany("INSERT INTO mood_types (code, label, description, score) VALUES (?, ?, ?, ?)", moods.MOODS)
+    # Настроения из старых записей, которых нет в справочнике, сохраняются с нулевой оценкой
+    conn.execute("INSERT INTO mood_types (label) SELECT DISTINCT mood FROM moods "
+                 "WHERE mood NOT IN (SELECT label FROM mood_types)")
+
+    conn.execute('''
+    CREATE TABLE moods_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        mood_id INTEGER NOT NULL,
+        comment TEXT,
+        question_answer TEXT,
+        date TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (mood_id) REFERENCES mood_types (code)
+    )
+    ''')
+    conn.execute('''
+    INSERT INTO moods_new (id, user_id, mood_id, comment, question_answer, date)
+    SELECT m.id, m.user_id, t.code, m.comment, m.question_answer, m.date
+    FROM moods m JOIN mood_types t ON t.label = m.mood
+    ''')
+    conn.execute("DROP TABLE moods")
+    conn.execute("ALTER TABLE moods_new RENAME TO moods")
+    conn.execute("CREATE INDEX idx_moods_user_date ON moods (user_id, date, id)")
+
+    conn.execute('''
+    CREATE TRIGGER moods_daily_insert AFTER INSERT ON moods
+    BEGIN
+        INSERT INTO mood_daily (user_id, date, count, score_sum)
+        VALUES (NEW.user_id, NEW.date, 1, (SELECT score FROM mood_types WHERE code = NEW.mood_id))
+        ON CONFLICT (user_id, date) DO UPDATE SET count = count + 1, score_sum = score_sum + excluded.score_sum;
+    END
+    ''')
+
+
+def full_text_search(conn):
+    # Полнотекстовый индекс FTS5 по комментариям и ответам на вопрос дня.
+    # Индекс хранит только токены (content='moods'), а синхронизацию с таблицей
+    # moods выполняют триггеры на вставку, удаление и изменение.
+    conn.execute('''
+    CREATE VIRTUAL TABLE moods_fts USING fts5(
+        comment, question_answer,
+        content='moods', content_rowid='id', tokenize='unicode61'
+    )
+    ''')
+    conn.execute('''
+    CREATE TRIGGER moods_fts_insert AFTER INSERT ON moods
+    BEGIN
+        INSERT INTO moods_fts (rowid, comment, question_answer)
+        VALUES (NEW.id, NEW.comment, NEW.question_answer);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER moods_fts_delete AFTER DELETE ON moods
+    BEGIN
+        INSERT INTO moods_fts (moods_fts, rowid, comment, question_answer)
+        VALUES ('delete', OLD.id, OLD.comment, OLD.question_answer);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER moods_fts_update AFTER UPDATE OF comment, question_answer ON moods
+    BEGIN
+        INSERT INTO moods_fts (moods_fts, rowid, comment, question_answer)
+        VALUES ('delete', OLD.id, OLD.comment, OLD.question_answer);
+        INSERT INTO moods_fts (rowid, comment, question_answer)
+        VALUES (NEW.id, NEW.comment, NEW.question_answer);
+    END
+    ''')
+    conn.execute("INSERT INTO moods_fts (moods_fts) VALUES ('rebuild')")  # Индексируем существующие записи
+
+
+def fixed_questions(conn):
+    # Таблица вопросов становится постоянным списком без дат: вопрос дня теперь
+    # вычисляется (см. questions.py), а не записывается в таблицу каждый день.
+    # Повторяющиеся строки, накопленные прежней схемой, схлопываются.
+    conn.execute('''
+    CREATE TABLE questions_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        question TEXT NOT NULL UNIQUE
+    )
+    ''')
+    conn.executemany("INSERT OR IGNORE INTO questions_new (question) VALUES (?)",
+                     [(question,) for question in QUESTIONS])
+    conn.execute("INSERT OR IGNORE INTO questions_new (question) SELECT question FROM questions ORDER BY id")
+    conn.execute("DROP TABLE questions")
+    conn.execute("ALTER TABLE questions_new RENAME TO questions")
+
+
+def drafts(conn):
+    # Черновик незаконченной записи: по одному на пользователя, хранится до сохранения записи.
+    conn.execute('''
+    CREATE TABLE drafts (
+        user_id INTEGER PRIMARY KEY,
+        mood_id INTEGER,
+        comment TEXT NOT NULL DEFAULT '',
+        question_answer TEXT NOT NULL DEFAULT '',
+        updated_at TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (mood_id) REFERENCES mood_types (code)
+    )
+    ''')
+
+
+def archive_registry(conn):
+    # Список архивов (см. archive.py): записи за год year перенесены в сжатый файл file.
+    conn.execute('''
+    CREATE TABLE archives (
+        year INTEGER PRIMARY KEY,
+        file TEXT NOT NULL,
+        entries INTEGER NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    ''')
+
+
+# Старая отдельная база вопросов, которая лежала рядом с основной
+LEGACY_QUESTIONS_DB = 'daily_questions.db'
+
+
+def legacy_questions(conn):
+    # Переносит вопросы из daily_questions.db в таблицу questions основной базы;
+    # после этого старый файл приложением не используется.
+    main_file = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not main_file:
+        return  # База в памяти
+    path = os.path.join(os.path.dirname(main_file), LEGACY_QUESTIONS_DB)
+    if not os.path.exists(path):
+        return
+    legacy = sqlite3.connect(f"{pathlib.Path(path).as_uri()}?mode=ro", uri=True)
+    try:
+        rows = legacy.execute("SELECT question FROM questions ORDER BY id").fetchall()
+    except sqlite3.DatabaseError:
+        rows = []  # Файл поврежден или в нем нет таблицы вопросов
+    finally:
+        legacy.close()
+    conn.executemany("INSERT OR IGNORE INTO questions (question) VALUES (?)", rows)
+
+
+def sessions(conn):
+    # Запомненные входы: в базе хранится только хэш случайного токена.
+    conn.execute('''
+    CREATE TABLE sessions (
+        token_hash TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        created_at TEXT NOT NULL,
+        expires_at TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+
+
+def data_versions(conn):
+    # Версия данных пользователя для кэша результатов (см. cache.py): растет при
+    # любом изменении его записей, в том числе из других процессов.
+    conn.execute("ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0")
+    conn.execute('''
+    CREATE TRIGGER moods_version_insert AFTER INSERT ON moods
+    BEGIN
+        UPDATE users SET data_version = data_version + 1 WHERE id = NEW.user_id;
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER moods_version_delete AFTER DELETE ON moods
+    BEGIN
+        UPDATE users SET data_version = data_version + 1 WHERE id = OLD.user_id;
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER moods_version_update AFTER UPDATE ON moods
+    BEGIN
+        UPDATE users SET data_version = data_version + 1 WHERE id IN (OLD.user_id, NEW.user_id);
+    END
+    ''')
+
+
+def mood_counts(conn):
+    # Число записей каждого настроения по дням вместо дневных агрегатов mood_daily:
+    # по ней считаются и средние для графика (через оценки mood_types), и ряд
+    # оценок analytics.load_series, не читая сами записи. Таблицу пополняет
+    # триггер на вставку, и строки сохраняются после архивации записей.
+    conn.execute('''
+    CREATE TABLE mood_counts (
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        mood_id INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (user_id, date, mood_id)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+    CREATE TRIGGER moods_counts_insert AFTER INSERT ON moods
+    BEGIN
+        INSERT INTO mood_counts (user_id, date, mood_id, count) VALUES (NEW.user_id, NEW.date, NEW.mood_id, 1)
+        ON CONFLICT (user_id, date, mood_id) DO UPDATE SET count = count + 1;
+    END
+    ''')
+    insert = ("INSERT INTO mood_counts (user_id, date, mood_id, count) VALUES (?, ?, ?, ?) "
+              "ON CONFLICT (user_id, date, mood_id) DO UPDATE SET count = count + excluded.count")
+    grouped = "SELECT user_id, date, mood_id, COUNT(*) FROM moods GROUP BY user_id, date, mood_id"
+    conn.executemany(insert, conn.execute(grouped).fetchall())
+
+    # Записи, уже перенесенные в архивы (см. archive.py)
+    import archive
+    main_file = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not main_file:
+        return  # База в памяти
+    directory = os.path.join(os.path.dirname(main_file), archive.ARCHIVE_DIR)
+    for (file,) in conn.execute("SELECT DISTINCT file FROM archives").fetchall():
+        path = archive.cached_copy(os.path.join(directory, file))
+        source = sqlite3.connect(f"{pathlib.Path(path).as_uri()}?mode=ro", uri=True)
+        try:
+            rows = source.execute(grouped).fetchall()
+        finally:
+            source.close()
+        conn.executemany(insert, rows)
+
+    conn.execute("DROP TRIGGER moods_daily_insert")
+    conn.execute("DROP TABLE mood_daily")
+
+
+MIGRATIONS = [
+    initial_schema,
+    iso_dates,
+    history_keyset_index,
+    daily_aggregates,
+    mood_catalogue,
+    full_text_search,
+    fixed_questions,
+    drafts,
+    archive_registry,
+    legacy_questions,
+    sessions,
+    data_versions,
+    mood_counts,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    # Применяет недостающие миграции; каждая выполняется в отдельной транзакции
+    # вместе с обновлением user_version. Возвращает итоговую версию схемы.
+    version = get_version(conn)
+    for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+        conn.execute("BEGIN")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+    return max(version, SCHEMA_VERSION)
@@ -0,0 +1,25 @@
+from collections import namedtuple
+
+# Настроение: code - код, хранящийся в записях, label - название в интерфейсе,
+# description - пояснение под выбором, score - оценка для графика и статистики
+Mood = namedtuple('Mood', ['code', 'label', 'description', 'score'])
+
+# Справочник настроений; при создании базы копируется в таблицу mood_types
+MOODS = (
+    Mood(1, "Самый счастливый человек на земле", "Высшее счастье.", 5),
+    Mood(2, "Счастливое", "Счастливое состояние.", 4),
+    Mood(3, "Удовлетворенное", "Чувство удовлетворения.", 3),
+    Mood(4, "Нейтральное", "Нейтральное состояние.", 2),
+    Mood(5, "Слегка подавленное", "Небольшое беспокойство.", 1),
+    Mood(6, "Раздосадованное", "Чувство раздражения.", 0),
+    Mood(7, "Тревожный", "Беспокойное настроение.", -1),
+    Mood(8, "Грустное", "Печальное ощущение.", -2),
+    Mood(9, "Подавленное", "Угнетенное состояние.", -3),
+    Mood(10, "Ужасное", "Крайнее страдание.", -4),
+)
+
+BY_CODE = {mood.code: mood for mood in MOODS}
+BY_LABEL = {mood.label: mood for mood in MOODS}
+
+MIN_SCORE = min(mood.score for mood in MOODS)
+MAX_SCORE = max(mood.score for mood in MOODS)
@@ -1,76 +1,90 @@
+import os
 import sys
-import sqlite3
-import hashlib
+import functools
+import html
 from PyQt6 import QtCore, QtGui, QtWidgets
-from PyQt6.QtGui import QIcon, QPixmap
+from PyQt6.QtGui import QIcon
 from datetime import datetime
-import matplotlib.pyplot as plt
-import numpy as np
-
-
-def create_connection(database):
-    # Создает соединение с базой данных.
-    return sqlite3.connect(database)
-
-
-def create_tables():
-    # Создает необходимые таблицы в базе данных.
-    with create_connection('mood_diary.db') as conn:
-        cursor = conn.cursor()
-
-        # Создание таблицы пользователей
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL UNIQUE,
-            password TEXT NOT NULL
-        )
-        ''')
-
-        # Создание таблицы настроений
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS moods (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            mood TEXT NOT NULL,
-            comment TEXT,
-            question_answer TEXT,
-            date TEXT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-        ''')
-
-        # Создание таблицы вопросов
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS questions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            question TEXT NOT NULL,
-            date TEXT NOT NULL UNIQUE
-        )
-        ''')
-
-        # Добавление вопросов, если их еще нет
-        questions = [
-            "Что сегодня сделало вас счастливым?",
-            "Какое ваше главное достижение сегодня?",
-            "Что вы могли бы улучшить в своем дне?",
-            "Какое ваше любимое воспоминание?",
-            "Что вас сегодня вдохновляет?",
-            "Как вам погода сегодня на улице?",
-            "Что вызывало у вас радость сегодня?",
-            "Что новое вы узнали за сегодня?",
-            "Что вам сегодня снилось?",
-            "Из-за чего вы сегодня расстраивались?",
-            "Что сегодня вас заставило улыбнуться?",
-            "Какая сегодняшняя ситуация запоминалась вам?",
-            "Что сегодня удивило?",
-            "Какой урок вы извлекли из сегодняшнего дня?",
-            "Какая часть вашего дня была самой продуктивной?",
-            "Чем вы гордитесь в конце дня?"
-        ]
 
-        for question in questions:
-            cursor.execute("INSERT OR IGNORE INTO questions (question, date) VALUES (?, '')", (question,))
+# matplotlib, numpy и analytics импортируются внутри окон графика и статистики:
+# они нужны только там, а их загрузка занимает большую часть времени запуска.
+from config import settings
+from database import HIGHLIGHT_START, HIGHLIGHT_END
+from instrumentation import metrics
+import moods
+from service import service, DiaryError
+from workers import TaskGroup, print_error
+
+
+ICON_PATH = 'Иконка.svg'
+
+
+@functools.cache
+def app_icon():
+    # Иконка приложения загружается один раз и используется всеми окнами.
+    return QIcon(ICON_PATH)
+
+
+def prepare_startup(app):
+    # Подготовка перед показом окна входа: миграции схемы (если версия
+    # уже актуальна, это одно чтение PRAGMA user_version) и общая иконка.
+    service.prepare()
+    app.setWindowIcon(app_icon())
+
+
+def display_date(iso_date):
+    # Переводит дату из формата хранения "ГГГГ-ММ-ДД" в привычный "ДД-ММ-ГГГГ".
+    return datetime.strptime(iso_date, "%Y-%m-%d").strftime("%d-%m-%Y")
+
+
+# Запомненный вход: токен хранится в файле settings.session_file, в базе - только его хэш
+
+def read_session_token():
+    try:
+        with open(settings.session_file, encoding='ascii') as file:
+            return file.read().strip() or None
+    except OSError:
+        return None
+
+
+def write_session_token(token):
+    # Файл с токеном доступен только владельцу.
+    descriptor = os.open(settings.session_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with open(descriptor, 'w', encoding='ascii') as file:
+        file.write(token)
+
+
+def remove_session_file():
+    try:
+        os.remove(settings.session_file)
+    except OSError:
+        pass
+
+
+def saved_session_user():
+    # id пользователя, вход которого запомнен на этом устройстве, или None.
+    if not settings.session_enabled:
+        return None
+    token = read_session_token()
+    user_id = service.resume_session(token)
+    if token and user_id is None:
+        remove_session_file()  # Срок входа истек
+    return user_id
+
+
+def login_and_remember(username, password):
+    # Вход с запоминанием (выполняется в фоновом потоке): после проверки пароля
+    # создается сессия, а ее токен сохраняется в файл.
+    user_id = service.login(username, password)
+    write_session_token(service.start_session(user_id))
+    return user_id
+
+
+def forget_session():
+    token = read_session_token()
+    if token:
+        service.end_session(token)
+    remove_session_file()
 
 
 class MainWindowUi(object):
@@ -87,6 +101,10 @@ class MainWindowUi(object):
         self.error_label.setText("")
         self.error_label.setObjectName("error_label")
 
+        self.remember_checkbox = QtWidgets.QCheckBox(parent=self.centralwidget)
+        self.remember_checkbox.setGeometry(QtCore.QRect(50, 290, 371, 31))
+        self.remember_checkbox.setObjectName("remember_checkbox")
+
         # Создание сплиттеров для организации интерфейса
         self.main_splitter = QtWidgets.QSplitter(parent=self.centralwidget)
         self.main_splitter.setGeometry(QtCore.QRect(46, 105, 731, 161))
@@ -128,7 +146,7 @@ class MainWindowUi(object):
         self.retranslateUi(MainWindow)
         QtCore.QMetaObject.connectSlotsByName(MainWindow)
 
-        MainWindow.setWindowIcon(QIcon('Иконка.svg'))  # добавление иконки
+        MainWindow.setWindowIcon(app_icon())  # добавление иконки
 
     def retranslateUi(self, MainWindow):
         _translate = QtCore.QCoreApplication.translate
@@ -137,6 +155,7 @@ class MainWindowUi(object):
         self.password_label.setText(_translate("MainWindow", "Пароль"))
         self.login_button.setText(_translate("MainWindow", "Вход"))
         self.register_button.setText(_translate("MainWindow", "Регистрация"))
+        self.remember_checkbox.setText(_translate("MainWindow", "Запомнить меня"))
 
 
 class MoodDiaryApp(QtWidgets.QMainWindow, MainWindowUi):
@@ -154,7 +173,9 @@ class MoodDiaryApp(QtWidgets.QMainWindow, MainWindowUi):
         self.username_input.returnPressed.connect(self.login)  # Нажатие Enter в поле логина
         self.password_input.returnPressed.connect(self.login)  # Нажатие Enter в поле пароля
 
+        self.remember_checkbox.setVisible(settings.session_enabled)
         self.is_open = False  # Флаг для отслеживания состояния окна
+        self.tasks = TaskGroup(self)  # Запросы к базе выполняются в фоновых потоках
 
     def open_register_window(self):
         # Метод для открытия окна регистрации.
@@ -164,28 +185,39 @@ class MoodDiaryApp(QtWidgets.QMainWindow, MainWindowUi):
             self.register_window.exec()  # Открываем окно регистрации как диалог
             self.is_open = False  # Сбрасываем флаг после закрытия окна
 
+    @QtCore.pyqtSlot()
+    @metrics.timed("ui.login")
     def login(self):
         # Метод для обработки входа пользователя.
         username = self.username_input.text().strip()
         password = self.password_input.text()
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
 
         if not username or not password:
             self.error_label.setText("Пожалуйста, заполните все поля.")
             return
 
-        with create_connection('mood_diary.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM users WHERE username=? AND password=?", (username, hashed_password))
-            user = cursor.fetchone()
-
-            if user:
-                self.error_label.setText("Успешный вход!")
-                self.current_user_id = user[0]
-                self.open_main_menu()  # открываем меню
-                self.close()  # Закрываем текущее окно
-            else:
-                self.error_label.setText("Неверное имя пользователя или пароль.")
+        if not self.login_button.isEnabled():
+            return  # Предыдущая попытка входа еще выполняется
+
+        self.login_button.setEnabled(False)
+        login = login_and_remember if self.remember_checkbox.isChecked() else service.login
+        self.tasks.start(login, username, password, on_result=self.on_login_result, on_error=self.on_login_error)
+
+    @metrics.timed("ui.on_login_result")
+    def on_login_result(self, user_id):
+        # Вызывается после успешной проверки логина и пароля.
+        self.login_button.setEnabled(True)
+        self.error_label.setText("Успешный вход!")
+        self.current_user_id = user_id
+        self.open_main_menu()  # открываем меню
+        self.close()  # Закрываем текущее окно
+
+    def on_login_error(self, error):
+        self.login_button.setEnabled(True)
+        if isinstance(error, DiaryError):
+            self.error_label.setText(str(error))  # Неверный пароль или слишком много попыток
+        else:
+            self.error_label.setText(f"Ошибка: {error}")
 
     def open_main_menu(self):
         # Открывает главное меню приложения.
@@ -219,7 +251,10 @@ class RegisterWindow(QtWidgets.QDialog):
         self.status_label = QtWidgets.QLabel("", self)
         self.status_label.setGeometry(50, 200, 300, 30)
 
-        self.setWindowIcon(QIcon('Иконка.svg'))
+        self.setWindowIcon(app_icon())
+
+        self.tasks = TaskGroup(self)
+        self.finished.connect(self.tasks.cancel_all)  # Диалог, закрытый по Esc, не получает события закрытия
 
         # Обработка нажатия клавиши Enter
         self.username_input.returnPressed.connect(self.register)  # Нажатие Enter в поле логина
@@ -229,34 +264,44 @@ class RegisterWindow(QtWidgets.QDialog):
         # Метод для регистрации нового пользователя.
         username = self.username_input.text().strip()
         password = self.password_input.text().strip()
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
 
         if not username or not password:
             self.status_label.setText("Пожалуйста, заполните все поля.")
             return
 
-        with create_connection('mood_diary.db') as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hashed_password))
-                conn.commit()
-                self.status_label.setText("Регистрация успешна!")
-                QtCore.QTimer.singleShot(500, self.close)  # Закрываем окно через 0.5 секунды после успешной регистрации
-            except sqlite3.IntegrityError:
-                self.status_label.setText("Пользователь с таким именем уже существует.")
-            except Exception as e:
-                self.status_label.setText(f"Ошибка: {e}")
+        if not self.register_button.isEnabled():
+            return  # Предыдущая попытка регистрации еще выполняется
+
+        self.register_button.setEnabled(False)
+        self.tasks.start(service.register, username, password,
+                         on_result=self.on_registered, on_error=self.on_register_error)
+
+    def on_registered(self, user_id):
+        self.status_label.setText("Регистрация успешна!")
+        QtCore.QTimer.singleShot(500, self.close)  # Закрываем окно через 0.5 секунды после успешной регистрации
+
+    def on_register_error(self, error):
+        self.register_button.setEnabled(True)
+        if isinstance(error, DiaryError):
+            self.status_label.setText(str(error))
+        else:
+            self.status_label.setText(f"Ошибка: {error}")
 
 
 class MoodDiaryWindow(QtWidgets.QMainWindow):
     # Класс для окна добавления записей о настроении.
 
+    saved = QtCore.pyqtSignal()  # Сигнал о сохранении новой записи
+
+    DRAFT_DELAY = 1000  # Черновик сохраняется через секунду после последней правки, мс
+
     def __init__(self, user_id):
         super().__init__()
         self.user_id = user_id
         self.setGeometry(0, 0, 935, 876)
         self.setWindowTitle("Дневник настроения")
-        self.setWindowIcon(QIcon('Иконка.svg'))
+        self.setWindowIcon(app_icon())
+        self.tasks = TaskGroup(self)
 
         # Создаем кнопку "Сохранить"
         self.save_button = QtWidgets.QPushButton("Сохранить", self)
@@ -274,20 +319,9 @@ class MoodDiaryWindow(QtWidgets.QMainWindow):
 
         # Создаем комбобокс для выбора настроения
         self.mood_combo = QtWidgets.QComboBox(self.splitter)
-        moods = [
-            "-",
-            "Самый счастливый человек на земле",
-            "Счастливое",
-            "Удовлетворенное",
-            "Нейтральное",
-            "Слегка подавленное",
-            "Раздосадованное",
-            "Тревожный",
-            "Грустное",
-            "Подавленное",
-            "Ужасное"
-        ]
-        self.mood_combo.addItems(moods)
+        self.mood_combo.addItem("-", None)
+        for mood in moods.MOODS:
+            self.mood_combo.addItem(mood.label, mood.code)  # Код настроения хранится в данных элемента
         self.mood_combo.currentIndexChanged.connect(self.update_mood_description)
 
         # Создаем метку для описания настроения
@@ -314,46 +348,81 @@ class MoodDiaryWindow(QtWidgets.QMainWindow):
         self.answer_input = QtWidgets.QTextEdit(self.comment_splitter)
         self.answer_input.setFont(QtGui.QFont("", 9))
 
-        # Загружаем вопрос дня
+        # Таймер автосохранения черновика: каждая правка перезапускает отсчет
+        self.draft_timer = QtCore.QTimer(self)
+        self.draft_timer.setSingleShot(True)
+        self.draft_timer.setInterval(self.DRAFT_DELAY)
+        self.draft_timer.timeout.connect(self.save_draft)
+
+        # Загружаем вопрос дня и незаконченную запись, если она есть
         self.load_daily_question()
+        self.tasks.start(service.load_draft, self.user_id, on_result=self.on_draft_loaded)
+
+    def connect_draft_autosave(self):
+        self.mood_combo.currentIndexChanged.connect(self.draft_timer.start)
+        self.comment_input.textChanged.connect(self.draft_timer.start)
+        self.answer_input.textChanged.connect(self.draft_timer.start)
+
+    def on_draft_loaded(self, draft):
+        # Восстанавливает черновик, если пользователь еще ничего не ввел.
+        if draft is not None and self.mood_combo.currentData() is None and not self.comment_input.toPlainText() \
+                and not self.answer_input.toPlainText():
+            mood_code, comment, answer = draft
+            self.mood_combo.setCurrentIndex(max(self.mood_combo.findData(mood_code), 0))
+            self.comment_input.setPlainText(comment)
+            self.answer_input.setPlainText(answer)
+        self.connect_draft_autosave()  # Правки отслеживаются только после восстановления
+
+    def entry_fields(self):
+        # Текущие значения полей: (код настроения, комментарий, ответ).
+        return self.mood_combo.currentData(), self.comment_input.toPlainText(), self.answer_input.toPlainText()
+
+    def save_draft(self):
+        self.tasks.start(service.save_draft, self.user_id, *self.entry_fields())
+
+    def closeEvent(self, event):
+        # Несохраненные правки черновика записываем сразу: окно закрывается.
+        if self.draft_timer.isActive():
+            self.draft_timer.stop()
+            try:
+                service.save_draft(self.user_id, *self.entry_fields())
+            except Exception as e:
+                print_error(e)
+        super().closeEvent(event)
 
+    @QtCore.pyqtSlot()
+    @metrics.timed("ui.save_mood")
     def save_mood(self):
         # Метод для сохранения настроения в базе данных.
-        mood = self.mood_combo.currentText()
-        comment = self.comment_input.toPlainText()
-        answer = self.answer_input.toPlainText()
-        date = datetime.now().strftime("%d-%m-%Y")
+        mood_code, comment, answer = self.entry_fields()
 
-        if mood == "-":
+        if mood_code is None:
             QtWidgets.QMessageBox.warning(self, "Ошибка", "Пожалуйста, выберите настроение.")
             return
 
-        with create_connection('mood_diary.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO moods (user_id, mood, comment, question_answer, date) VALUES (?, ?, ?, ?, ?)",
-                           (self.user_id, mood, comment, answer, date))
-            conn.commit()
+        self.draft_timer.stop()
+        self.save_button.setEnabled(False)  # Защита от повторного сохранения, пока запись пишется
+        self.tasks.start(functools.partial(service.add_entry, clear_draft=True), self.user_id, mood_code,
+                         comment, answer, on_result=self.on_saved, on_error=self.on_save_error)
+
+    @metrics.timed("ui.on_saved")
+    def on_saved(self, mood_id):
+        # Вызывается после записи настроения в базу; черновик к этому моменту удален.
+        self.saved.emit()
 
         QtWidgets.QMessageBox.information(self, "Успех", "Ваше настроение сохранено.")
         self.clear_fields()  # Очищаем поля после сохранения
+        self.draft_timer.stop()  # Очистка полей - не правка черновика
         self.close()  # Закрываем окно после успешного сохранения
 
+    def on_save_error(self, error):
+        self.save_button.setEnabled(True)
+        QtWidgets.QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить запись: {error}")
+
     def update_mood_description(self):
         # Обновляет описание настроения в зависимости от выбора.
-        mood_descriptions = {
-            "Самый счастливый человек на земле": "Высшее счастье.",
-            "Счастливое": "Счастливое состояние.",
-            "Удовлетворенное": "Чувство удовлетворения.",
-            "Нейтральное": "Нейтральное состояние.",
-            "Слегка подавленное": "Небольшое беспокойство.",
-            "Раздосадованное": "Чувство раздражения.",
-            "Тревожный": "Беспокойное настроение.",
-            "Грустное": "Печальное ощущение.",
-            "Подавленное": "Угнетенное состояние.",
-            "Ужасное": "Крайнее страдание."
-        }
-        selected_mood = self.mood_combo.currentText()
-        description = mood_descriptions.get(selected_mood, "")
+        mood = moods.BY_CODE.get(self.mood_combo.currentData())
+        description = mood.description if mood else ""
         self.mood_description_label.setText(description)  # Устанавливаем текст описания настроения
 
     def clear_fields(self):
@@ -362,28 +431,406 @@ class MoodDiaryWindow(QtWidgets.QMainWindow):
         self.comment_input.clear()  # Очищаем текстовое поле комментария
         self.answer_input.clear()  # Очищаем текстовое поле ответа на вопрос
 
+    @metrics.timed("ui.load_daily_question")
     def load_daily_question(self):
         # Загружает вопрос дня из базы данных.
-        with create_connection('mood_diary.db') as conn:
-            cursor = conn.cursor()
-
-            # Получаем текущую дату
-            today = datetime.now().date()
-            cursor.execute("SELECT question FROM questions WHERE date = ?", (today,))
-            question = cursor.fetchone()
-
-            if question:
-                self.question_label.setText(question[0])  # Устанавливаем вопрос дня
-            else:
-                # Если вопрос не установлен на сегодня, выбираем случайный вопрос
-                cursor.execute("SELECT question FROM questions ORDER BY RANDOM() LIMIT 1")
-                random_question = cursor.fetchone()
-                if random_question:
-                    self.question_label.setText(random_question[0])  # Устанавливаем случайный вопрос
-                    # Устанавливаем вопрос на сегодня
-                    cursor.execute("INSERT OR REPLACE INTO questions (question, date) VALUES (?, ?)",
-                                   (random_question[0], today))
-                    conn.commit()
+        self.tasks.start(service.daily_question, self.user_id, on_result=self.on_question_loaded)
+
+    @metrics.timed("ui.on_question_loaded")
+    def on_question_loaded(self, question):
+        if question:
+            self.question_label.setText(question)  # Устанавливаем вопрос дня
+
+
+class HistoryTableModel(QtCore.QAbstractTableModel):
+    # Модель истории настроений: записи подгружаются страницами по мере прокрутки.
+
+    PAGE_SIZE = 100
+    HEADERS = ("Дата", "Настроение", "Комментарий")
+
+    def __init__(self, user_id, tasks, parent=None):
+        super().__init__(parent)
+        self.user_id = user_id
+        self.tasks = tasks  # Группа фоновых задач окна, в которой загружаются страницы
+        self.records = []  # Загруженные записи (id, date, mood, comment)
+        self.has_more = True
+        self.loading = False
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != QtCore.Qt.ItemDataRole.DisplayRole:
+            return None
+        record_id, date, mood, comment = self.records[index.row()]
+        return (display_date(date), mood, comment)[index.column()]
+
+    def headerData(self, section, orientation, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if role == QtCore.Qt.ItemDataRole.DisplayRole and orientation == QtCore.Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and self.has_more and not self.loading
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        # Запускает фоновую загрузку следующей страницы, продолжая с последней загруженной записи.
+        if not self.canFetchMore(parent):
+            return
+        self.loading = True
+        before = (self.records[-1][1], self.records[-1][0]) if self.records else None
+        self.tasks.start(service.history, self.user_id, before, self.PAGE_SIZE,
+                         on_result=self.add_page, on_error=self.page_failed)
+
+    def add_page(self, page):
+        # Добавляет в модель загруженную страницу записей.
+        self.loading = False
+        self.has_more = len(page) == self.PAGE_SIZE
+        if page:
+            self.beginInsertRows(QtCore.QModelIndex(), len(self.records), len(self.records) + len(page) - 1)
+            self.records.extend(page)
+            self.endInsertRows()
+
+    def page_failed(self, error):
+        # Страница не загрузилась: при следующей прокрутке загрузка повторится.
+        self.loading = False
+        QtWidgets.QMessageBox.warning(self.parent(), "Ошибка", f"Не удалось загрузить историю: {error}")
+
+
+class HistoryWindow(QtWidgets.QMainWindow):
+    # Окно истории настроений в виде прокручиваемой таблицы.
+
+    def __init__(self, user_id, first_page):
+        super().__init__()
+        self.setWindowTitle("История настроений")
+        self.setGeometry(150, 150, 800, 600)
+        self.setWindowIcon(app_icon())
+        self.tasks = TaskGroup(self)
+
+        self.model = HistoryTableModel(user_id, self.tasks, self)
+        self.model.add_page(first_page)
+
+        self.table = QtWidgets.QTableView(self)
+        self.table.setModel(self.model)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setStretchLastSection(True)  # Комментарий занимает оставшуюся ширину
+        self.setCentralWidget(self.table)
+
+
+class MoodChartWidget(QtWidgets.QWidget):
+    # Встроенный график средней оценки настроения по дням.
+    # Фигура создается один раз, при обновлении меняются только данные линии.
+
+    def __init__(self, user_id, tasks, parent=None):
+        super().__init__(parent)
+        self.user_id = user_id
+        self.tasks = tasks  # Группа фоновых задач окна, в которой готовятся данные графика
+
+        import matplotlib.dates as mdates
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+        from matplotlib.figure import Figure
+
+        self.figure = Figure(figsize=(8, 5), tight_layout=True)
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.canvas)
+
+        self.axes = self.figure.add_subplot()
+        self.axes.xaxis_date()
+        self.axes.xaxis.set_major_formatter(mdates.DateFormatter('%d-%m-%Y'))
+        self.axes.set_xlabel('Дата')  # Подпись оси X
+        self.axes.set_ylabel('Оценка настроения')  # Подпись оси Y
+        self.axes.set_title('График настроений')  # Заголовок графика
+        self.axes.set_ylim(moods.MIN_SCORE - 0.5, moods.MAX_SCORE + 0.5)  # Диапазон оценок из справочника
+        self.axes.axhline(0, color='black', linewidth=0.8)  # Горизонтальная линия на уровне 0
+        self.axes.grid(axis='y')  # Включаем сетку по оси Y
+        self.line, = self.axes.plot([], [], marker='o', markersize=3)
+        self.figure.autofmt_xdate(rotation=45)
+
+    def has_data(self):
+        return len(self.line.get_xdata()) > 0
+
+    @staticmethod
+    def load_data(user_id):
+        # Готовит данные графика (выполняется в фоновом потоке).
+        import matplotlib.dates as mdates
+        import numpy as np
+
+        rows = service.plot_data(user_id)
+        dates = mdates.date2num(np.array([row[0] for row in rows], dtype='datetime64[D]'))
+        means = np.fromiter((row[1] for row in rows), dtype=float, count=len(rows))
+        return dates, means
+
+    def refresh(self, on_done=None):
+        # Перечитывает дневные агрегаты в фоне; on_done вызывается после обновления графика.
+        self.tasks.start(self.load_data, self.user_id, on_result=lambda data: self.update_line(data, on_done))
+
+    @metrics.timed("ui.update_chart")
+    def update_line(self, data, on_done=None):
+        # Обновляет линию графика на месте.
+        dates, means = data
+        self.line.set_data(dates, means)
+        if len(dates):
+            self.axes.set_xlim(dates[0] - 1, dates[-1] + 1)
+        self.canvas.draw_idle()
+        if on_done is not None:
+            on_done()
+
+
+class MoodChartWindow(QtWidgets.QMainWindow):
+    # Окно с графиком настроений пользователя.
+
+    def __init__(self, user_id):
+        super().__init__()
+        self.setWindowTitle("График настроений")
+        self.setGeometry(150, 150, 900, 600)
+        self.setWindowIcon(app_icon())
+        self.tasks = TaskGroup(self)
+
+        self.chart = MoodChartWidget(user_id, self.tasks, self)
+        self.setCentralWidget(self.chart)
+
+
+class StatisticsWindow(QtWidgets.QMainWindow):
+    # Окно статистики: скользящие средние, профиль по дням недели и месяцам, серии и распределение.
+
+    def __init__(self, stats):
+        super().__init__()
+        self.setWindowTitle("Статистика")
+        self.setGeometry(150, 150, 1000, 700)
+        self.setWindowIcon(app_icon())
+
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+        from matplotlib.figure import Figure
+
+        central = QtWidgets.QWidget(self)
+        layout = QtWidgets.QHBoxLayout(central)
+        self.summary_label = QtWidgets.QLabel(self.format_summary(stats), central)
+        self.summary_label.setFont(QtGui.QFont("", 10))
+        self.summary_label.setAlignment(QtCore.Qt.AlignmentFlag.AlignTop)
+        layout.addWidget(self.summary_label)
+
+        self.figure = Figure(figsize=(7, 6), tight_layout=True)
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        layout.addWidget(self.canvas, stretch=1)
+        self.plot(stats)
+        self.setCentralWidget(central)
+
+    @staticmethod
+    def format_summary(stats):
+        # Формирует текстовую сводку по статистике.
+        import analytics
+        import numpy as np
+
+        distribution = stats['distribution']
+        lines = [
+            f"Записей: {stats['entries']}",
+            f"Средняя оценка: {stats['mean']:.2f}",
+            f"Самая длинная серия хороших дней: {stats['positive_streak']}",
+            f"Самая длинная серия плохих дней: {stats['negative_streak']}",
+            "",
+            "Распределение настроений:",
+        ]
+        lines.extend(f"  {mood.label}: {distribution[mood.score - moods.MIN_SCORE]}" for mood in moods.MOODS)
+        lines.append("")
+        lines.append("Средняя оценка по месяцам:")
+        lines.extend(f"  {month}: {value:.2f}" for month, value in zip(analytics.MONTHS, stats['months'])
+                     if not np.isnan(value))
+        return "\n".join(lines)
+
+    def plot(self, stats):
+        # Строит скользящие средние и профиль по дням недели.
+        import analytics
+        import matplotlib.dates as mdates
+        import numpy as np
+
+        day_series = stats['daily']
+        days = mdates.date2num(np.arange(day_series.first_day, day_series.first_day + len(day_series.mean))
+                               .astype('datetime64[D]'))
+
+        rolling_axes = self.figure.add_subplot(2, 1, 1)
+        rolling_axes.xaxis_date()
+        rolling_axes.xaxis.set_major_formatter(mdates.DateFormatter('%d-%m-%Y'))
+        rolling_axes.plot(days, stats['rolling_7'], label='7 дней')
+        rolling_axes.plot(days, stats['rolling_30'], label='30 дней')
+        rolling_axes.axhline(0, color='black', linewidth=0.8)
+        rolling_axes.set_title('Скользящее среднее')
+        rolling_axes.legend()
+        rolling_axes.grid(axis='y')
+
+        weekday_axes = self.figure.add_subplot(2, 1, 2)
+        weekday_axes.bar(np.arange(7), np.nan_to_num(stats['weekdays']), tick_label=analytics.WEEKDAYS)
+        weekday_axes.axhline(0, color='black', linewidth=0.8)
+        weekday_axes.set_title('Средняя оценка по дням недели')
+        weekday_axes.grid(axis='y')
+
+
+class SearchWindow(QtWidgets.QMainWindow):
+    # Окно полнотекстового поиска по комментариям и ответам на вопрос дня.
+
+    PAGE_SIZE = 50
+
+    def __init__(self, user_id):
+        super().__init__()
+        self.user_id = user_id
+        self.setWindowTitle("Поиск по записям")
+        self.setGeometry(150, 150, 800, 600)
+        self.setWindowIcon(app_icon())
+        self.tasks = TaskGroup(self)
+
+        central = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(central)
+
+        # Строка запроса и фильтры
+        filters = QtWidgets.QHBoxLayout()
+        self.query_input = QtWidgets.QLineEdit(central)
+        self.query_input.setPlaceholderText("Что искать, например: экзамен")
+        self.query_input.returnPressed.connect(self.search)
+        filters.addWidget(self.query_input, stretch=1)
+
+        self.mood_combo = QtWidgets.QComboBox(central)
+        self.mood_combo.addItem("Любое настроение", None)
+        for mood in moods.MOODS:
+            self.mood_combo.addItem(mood.label, mood.code)
+        filters.addWidget(self.mood_combo)
+
+        self.period_check = QtWidgets.QCheckBox("Период:", central)
+        filters.addWidget(self.period_check)
+        today = QtCore.QDate.currentDate()
+        self.start_edit = QtWidgets.QDateEdit(today.addYears(-1), central)
+        self.end_edit = QtWidgets.QDateEdit(today, central)
+        for date_edit in (self.start_edit, self.end_edit):
+            date_edit.setDisplayFormat("dd-MM-yyyy")
+            date_edit.setCalendarPopup(True)
+            date_edit.setEnabled(False)
+            self.period_check.toggled.connect(date_edit.setEnabled)
+            filters.addWidget(date_edit)
+
+        self.search_button = QtWidgets.QPushButton("Найти", central)
+        self.search_button.clicked.connect(self.search)
+        filters.addWidget(self.search_button)
+        layout.addLayout(filters)
+
+        # Архивные годы в полнотекстовый индекс не входят; предупреждаем, если они есть
+        self.archive_label = QtWidgets.QLabel(central)
+        self.archive_label.setWordWrap(True)
+        self.archive_label.setVisible(False)
+        layout.addWidget(self.archive_label)
+
+        self.results_view = QtWidgets.QTextBrowser(central)
+        layout.addWidget(self.results_view, stretch=1)
+
+        self.more_button = QtWidgets.QPushButton("Показать ещё", central)
+        self.more_button.setVisible(False)
+        self.more_button.clicked.connect(self.load_more)
+        layout.addWidget(self.more_button)
+
+        self.setCentralWidget(central)
+        self.filters = None  # Параметры последнего поиска
+        self.offset = 0
+        self.tasks.start(service.archived_years, on_result=self.show_archive_note)
+
+    def show_archive_note(self, years):
+        if years:
+            listed = ", ".join(str(year) for year in years)
+            self.archive_label.setText(f"Записи за архивные годы ({listed}) в поиске не участвуют.")
+            self.archive_label.setVisible(True)
+
+    def search(self):
+        # Начинает новый поиск с текущими фильтрами.
+        text = self.query_input.text().strip()
+        if not text:
+            return
+        start = end = None
+        if self.period_check.isChecked():
+            start = self.start_edit.date().toString("yyyy-MM-dd")
+            end = self.end_edit.date().toString("yyyy-MM-dd")
+        self.filters = (text, self.mood_combo.currentData(), start, end)
+        self.offset = 0
+        self.results_view.clear()
+        self.load_more()
+
+    def load_more(self):
+        # Загружает следующую страницу результатов.
+        self.more_button.setEnabled(False)
+        self.tasks.start(service.search, self.user_id, *self.filters, self.PAGE_SIZE, self.offset,
+                         on_result=self.show_results)
+
+    def show_results(self, rows):
+        if not rows and self.offset == 0:
+            self.results_view.setPlainText("Ничего не найдено.")
+        for record_id, date, mood, snippet in rows:
+            text = html.escape(snippet).replace(HIGHLIGHT_START, "<b>").replace(HIGHLIGHT_END, "</b>")
+            self.results_view.append(f"<p><i>{display_date(date)}</i> — {html.escape(mood)}<br>{text}</p>")
+        self.offset += len(rows)
+        self.more_button.setVisible(len(rows) == self.PAGE_SIZE)
+        self.more_button.setEnabled(True)
+
+
+class DiagnosticsWindow(QtWidgets.QMainWindow):
+    # Окно диагностики: замеры операций интерфейса, фоновых задач и SQL-запросов.
+
+    COLUMNS = ("Операция", "Вызовов", "Всего, мс", "Среднее, мс", "p50, мс", "p95, мс", "Макс., мс")
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Диагностика")
+        self.setGeometry(150, 150, 1000, 600)
+        self.setWindowIcon(app_icon())
+
+        central = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(central)
+        self.status_label = QtWidgets.QLabel(central)
+        layout.addWidget(self.status_label)
+
+        self.table = QtWidgets.QTableWidget(0, len(self.COLUMNS), central)
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        buttons = QtWidgets.QHBoxLayout()
+        for text, slot in (("Обновить", self.refresh), ("Сохранить в JSON", self.export), ("Сбросить", self.reset)):
+            button = QtWidgets.QPushButton(text, central)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+        self.setCentralWidget(central)
+        self.refresh()
+
+    def refresh(self):
+        # Перечитывает замеры: сначала операции, затем запросы, самые затратные сверху.
+        snapshot = metrics.snapshot()
+        if not snapshot['enabled']:
+            self.status_label.setText("Замеры выключены: включите их в config.ini (секция [diagnostics]).")
+        else:
+            self.status_label.setText(f"Медленных запросов (от {snapshot['slow_query_ms']:g} мс): "
+                                      f"{len(snapshot['slow_queries'])}")
+        rows = sorted(snapshot['timings'].items(), key=lambda item: -item[1]['total_ms'])
+        rows += [(f"SQL: {sql}", stats) for sql, stats in snapshot['queries'].items()]
+        self.table.setRowCount(len(rows))
+        for row, (name, stats) in enumerate(rows):
+            values = (name, str(stats['count'])) + tuple(
+                f"{stats[key]:.2f}" for key in ('total_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms'))
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QtWidgets.QTableWidgetItem(value))
+
+    def export(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Сохранить замеры", "diagnostics.json", "JSON (*.json)")
+        if path:
+            try:
+                metrics.export(path)
+            except OSError as e:
+                QtWidgets.QMessageBox.warning(self, "Ошибка", str(e))
+
+    def reset(self):
+        metrics.reset()
+        self.refresh()
 
 
 class Menu(QtWidgets.QMainWindow):
@@ -394,14 +841,14 @@ class Menu(QtWidgets.QMainWindow):
         super().__init__()
         self.user_id = user_id
         self.setWindowTitle("Меню")
-        self.setGeometry(100, 100, 800, 600)
-        self.setWindowIcon(QIcon('Иконка.svg'))
+        self.setGeometry(100, 100, 800, 700)
+        self.setWindowIcon(app_icon())
 
         # Создаем QLabel для отображения иконки приложения
         self.icon_label = QtWidgets.QLabel(self)
         self.icon_label.setGeometry(350, 10, 100, 100)  # Установите размеры и позицию по своему усмотрению
         self.icon_label.setPixmap(
-            QPixmap('Иконка.svg').scaled(100, 100, QtCore.Qt.AspectRatioMode.KeepAspectRatio))  # Установите иконку
+            app_icon().pixmap(100, 100))  # Установите иконку
 
         self.history_button = QtWidgets.QPushButton("Показать историю настроений", self)
         self.history_button.setGeometry(250, 120, 300, 40)
@@ -421,89 +868,172 @@ class Menu(QtWidgets.QMainWindow):
         self.question_button.clicked.connect(
             self.show_daily_question)  # Подключаем кнопку к методу показа вопроса дня
 
+        self.statistics_button = QtWidgets.QPushButton("Статистика", self)
+        self.statistics_button.setGeometry(250, 320, 300, 40)
+        self.statistics_button.clicked.connect(self.show_statistics)  # Подключаем кнопку к окну статистики
+
+        self.search_button = QtWidgets.QPushButton("Поиск по записям", self)
+        self.search_button.setGeometry(250, 370, 300, 40)
+        self.search_button.clicked.connect(self.show_search)  # Подключаем кнопку к окну поиска
+
+        self.export_button = QtWidgets.QPushButton("Экспорт записей", self)
+        self.export_button.setGeometry(250, 420, 300, 40)
+        self.export_button.clicked.connect(self.export_moods)  # Подключаем кнопку к выгрузке записей в файл
+
+        self.import_button = QtWidgets.QPushButton("Импорт записей", self)
+        self.import_button.setGeometry(250, 470, 300, 40)
+        self.import_button.clicked.connect(self.import_moods)  # Подключаем кнопку к загрузке записей из файла
+
+        self.diagnostics_button = QtWidgets.QPushButton("Диагностика", self)
+        self.diagnostics_button.setGeometry(250, 520, 300, 40)
+        self.diagnostics_button.clicked.connect(self.show_diagnostics)  # Подключаем кнопку к окну диагностики
+
+        self.logout_button = QtWidgets.QPushButton("Выйти из аккаунта", self)
+        self.logout_button.setGeometry(250, 570, 300, 40)
+        self.logout_button.clicked.connect(self.logout)  # Подключаем кнопку к выходу из аккаунта
+
         self.close_button = QtWidgets.QPushButton("Закрыть", self)
-        self.close_button.setGeometry(250, 320, 300, 40)
+        self.close_button.setGeometry(250, 620, 300, 40)
         self.close_button.clicked.connect(self.close)  # Подключаем кнопку к закрытию приложения
 
+        self.chart_window = None  # Окно графика создается при первом открытии и затем переиспользуется
+        self.tasks = TaskGroup(self)
+
     def open_mood_diary_window(self):
         # Метод для открытия окна добавления записи о настроении.
         self.mood_diary_window = MoodDiaryWindow(self.user_id)  # Создаем экземпляр окна добавления настроений
+        self.mood_diary_window.saved.connect(self.on_mood_saved)
         self.mood_diary_window.show()  # Показываем окно добавления настроений
 
+    def on_mood_saved(self):
+        # Обновляет открытый график после сохранения новой записи.
+        if self.chart_window is not None:
+            self.chart_window.chart.refresh()
+
+    @QtCore.pyqtSlot()
+    @metrics.timed("ui.show_history")
     def show_history(self):
         # Отображает историю настроений пользователя.
-        with create_connection('mood_diary.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT date, mood, comment FROM moods WHERE user_id=?", (self.user_id,))
-            records = cursor.fetchall()  # Получаем все записи настроений пользователя
-
-            history_text = ""
-            for record in records:
-                history_text += f"{record[0]}: {record[1]} - {record[2]}\n"  # Форматируем текст истории
-
-            if not history_text:
-                history_text = "Нет записей о настроении."  # Сообщение, если записей нет
+        self.tasks.start(service.history, self.user_id, None, HistoryTableModel.PAGE_SIZE,
+                         on_result=self.on_history_loaded)  # Загружаем первую страницу записей
+
+    @metrics.timed("ui.on_history_loaded")
+    def on_history_loaded(self, first_page):
+        if not first_page:
+            QtWidgets.QMessageBox.information(self, "История настроений",
+                                              "Нет записей о настроении.")  # Сообщение, если записей нет
+            return
 
-            QtWidgets.QMessageBox.information(self, "История настроений", history_text)  # Показываем сообщение
+        self.history_window = HistoryWindow(self.user_id, first_page)
+        self.history_window.show()
 
+    @QtCore.pyqtSlot()
+    @metrics.timed("ui.show_plot")
     def show_plot(self):
         # Отображает график настроений пользователя.
-        with create_connection('mood_diary.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT date, mood FROM moods WHERE user_id=?", (self.user_id,))
-            records = cursor.fetchall()  # Получаем все записи настроений
-
-            if not records:
-                QtWidgets.QMessageBox.warning(self, "Ошибка", "Нет записей о настроении для построения графика.")
-                return  # Если нет записей, показываем предупреждение
-
-            dates = [record[0] for record in records]  # Извлекаем даты записей
-            moods = [record[1] for record in records]  # Извлекаем настроения
-
-            # Определяем значения для настроений
-            mood_values = {
-                "Самый счастливый человек на земле": 5,
-                "Счастливое": 4,
-                "Удовлетворенное": 3,
-                "Нейтральное": 2,
-                "Слегка подавленное": 1,
-                "Раздосадованное": 0,
-                "Тревожный": -1,
-                "Грустное": -2,
-                "Подавленное": -3,
-                "Ужасное": -4
-            }
-
-            mood_scores = [mood_values.get(mood, 0) for mood in moods]  # Преобразуем настроения в числовые значения
-            x = np.arange(len(dates))  # Определяем ось X для графика
-
-            # Построение графика
-            plt.bar(x, mood_scores, align='center')
-            plt.xticks(x, dates, rotation=45)  # Устанавливаем метки по оси X
-            plt.xlabel('Дата')  # Подпись оси X
-            plt.ylabel('Оценка настроения')  # Подпись оси Y
-            plt.title('График настроений')  # Заголовок графика
-            plt.axhline(0, color='black', linewidth=0.8)  # Горизонтальная линия на уровне 0
-            plt.grid(axis='y')  # Включаем сетку по оси Y
-            plt.show()  # Показываем график
+        if self.chart_window is None:
+            self.chart_window = MoodChartWindow(self.user_id)
+        self.chart_window.chart.refresh(on_done=self.on_chart_loaded)
+
+    @metrics.timed("ui.on_chart_loaded")
+    def on_chart_loaded(self):
+        if not self.chart_window.chart.has_data():
+            QtWidgets.QMessageBox.warning(self, "Ошибка", "Нет записей о настроении для построения графика.")
+            return  # Если нет записей, показываем предупреждение
+
+        self.chart_window.show()
+        self.chart_window.raise_()
+
+    @QtCore.pyqtSlot()
+    @metrics.timed("ui.show_statistics")
+    def show_statistics(self):
+        # Отображает статистику настроений пользователя.
+        self.tasks.start(service.statistics, self.user_id, on_result=self.on_statistics_loaded)
+
+    @metrics.timed("ui.on_statistics_loaded")
+    def on_statistics_loaded(self, stats):
+        if stats['entries'] == 0:
+            QtWidgets.QMessageBox.warning(self, "Ошибка", "Нет записей о настроении для статистики.")
+            return
+
+        self.statistics_window = StatisticsWindow(stats)
+        self.statistics_window.show()
+
+    def logout(self):
+        # Выход из аккаунта: запомненный вход забывается, открывается окно входа.
+        forget_session()
+        self.login_window = MoodDiaryApp()
+        self.login_window.show()
+        self.close()
+
+    def show_diagnostics(self):
+        self.diagnostics_window = DiagnosticsWindow()
+        self.diagnostics_window.show()
+
+    def show_search(self):
+        # Открывает окно поиска по записям.
+        self.search_window = SearchWindow(self.user_id)
+        self.search_window.show()
+
+    def export_moods(self):
+        # Выгружает все записи пользователя в файл CSV или JSONL.
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Экспорт записей", "moods.csv",
+                                                        "CSV (*.csv);;JSON Lines (*.jsonl)")
+        if not path:
+            return
+        self.export_button.setEnabled(False)
+        self.tasks.start(service.export_entries, self.user_id, path,
+                         on_result=self.on_exported, on_error=self.on_transfer_error,
+                         on_progress=lambda count: self.statusBar().showMessage(f"Выгружено записей: {count}"))
+
+    def on_exported(self, count):
+        self.export_button.setEnabled(True)
+        self.statusBar().clearMessage()
+        QtWidgets.QMessageBox.information(self, "Экспорт записей", f"Выгружено записей: {count}")
+
+    def import_moods(self):
+        # Загружает записи из файла CSV или JSONL.
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Импорт записей", "",
+                                                        "Записи (*.csv *.jsonl *.json)")
+        if not path:
+            return
+        self.import_button.setEnabled(False)
+        self.tasks.start(service.import_entries, self.user_id, path,
+                         on_result=self.on_imported, on_error=self.on_transfer_error,
+                         on_progress=lambda count: self.statusBar().showMessage(f"Загружено записей: {count}"))
+
+    def on_imported(self, count):
+        self.import_button.setEnabled(True)
+        self.statusBar().clearMessage()
+        self.on_mood_saved()  # Обновляем открытый график
+        QtWidgets.QMessageBox.information(self, "Импорт записей", f"Загружено записей: {count}")
+
+    def on_transfer_error(self, error):
+        self.export_button.setEnabled(True)
+        self.import_button.setEnabled(True)
+        self.statusBar().clearMessage()
+        QtWidgets.QMessageBox.warning(self, "Ошибка", str(error))
 
     def show_daily_question(self):
         # Отображает вопрос дня.
-        with create_connection('mood_diary.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT question FROM questions WHERE date = ?", (datetime.now().date(),))
-            question = cursor.fetchone()  # Получаем вопрос дня
+        self.tasks.start(service.daily_question, self.user_id,
+                         on_result=self.on_daily_question_loaded)  # Получаем вопрос дня
 
-            if question:
-                QtWidgets.QMessageBox.information(self, "Вопрос дня", question[0])  # Показываем вопрос
-            else:
-                QtWidgets.QMessageBox.warning(self, "Ошибка",
-                                              "Нет доступного вопроса на сегодня.")  # Предупреждение, если вопроса нет
+    def on_daily_question_loaded(self, question):
+        if question:
+            QtWidgets.QMessageBox.information(self, "Вопрос дня", question)  # Показываем вопрос
+        else:
+            QtWidgets.QMessageBox.warning(self, "Ошибка",
+                                          "Нет доступного вопроса на сегодня.")  # Предупреждение, если вопроса нет
 
 
 if __name__ == "__main__":
-    create_tables()  # Создание таблиц при запуске приложения
     app = QtWidgets.QApplication(sys.argv)
-    window = MoodDiaryApp()
+    prepare_startup(app)  # Создание таблиц при запуске приложения
+    user_id = saved_session_user()
+    window = Menu(user_id) if user_id is not None else MoodDiaryApp()  # Запомненный вход сразу открывает меню
     window.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    QtCore.QThreadPool.globalInstance().waitForDone()  # Дожидаемся незавершенных записей в базу
+    service.close()  # Дописываем очередь отложенной записи
+    sys.exit(exit_code)
@@ -0,0 +1,69 @@
+import random
+import threading
+from datetime import date
+
+from database import db
+
+# Планировщик вопроса дня. Вопрос вычисляется, а не хранится: для каждого
+# пользователя вопросы идут циклами, каждый цикл - своя детерминированная
+# перестановка всех вопросов. Поэтому за один цикл вопрос не повторяется,
+# у разных пользователей порядок разный, а в базу ничего не пишется.
+
+
+class QuestionScheduler:
+
+    def __init__(self, db):
+        self.db = db
+        self._questions = None  # Список текстов вопросов, загружается один раз
+        self._cache = {}  # user_id -> вопрос на текущий день
+        self._cache_day = None
+        self._lock = threading.Lock()
+
+    def questions(self):
+        if self._questions is None:
+            self._questions = [question for _, question in self.db.get_questions()]
+        return self._questions
+
+    def _shuffled(self, user_id, cycle):
+        order = list(range(len(self.questions())))
+        random.Random(f"{user_id}:{cycle}").shuffle(order)
+        return order
+
+    def _cycle_order(self, user_id, cycle):
+        # Перестановка индексов вопросов для цикла cycle пользователя user_id.
+        order = self._shuffled(user_id, cycle)
+        if len(order) > 2 and order[0] == self._shuffled(user_id, cycle - 1)[-1]:
+            # Первый вопрос цикла не должен совпасть с последним вопросом предыдущего
+            order[0], order[1] = order[1], order[0]
+        return order
+
+    def _index_for(self, user_id, day_number):
+        cycle, position = divmod(day_number, len(self.questions()))
+        return self._cycle_order(user_id, cycle)[position]
+
+    def question_for(self, user_id, day=None):
+        # Вопрос дня для пользователя на дату day или None, если вопросов нет.
+        # Вопросы на сегодня (day не задан) кэшируются в памяти.
+        if day is not None:
+            return self._question_on(user_id, day.toordinal())
+
+        today = date.today().toordinal()
+        with self._lock:
+            if self._cache_day != today:
+                self._cache.clear()  # Наступил новый день: вопросы прошлого дня больше не нужны
+                self._cache_day = today
+            if user_id in self._cache:
+                return self._cache[user_id]
+        question = self._question_on(user_id, today)
+        with self._lock:
+            if self._cache_day == today:
+                self._cache[user_id] = question
+        return question
+
+    def _question_on(self, user_id, day_number):
+        if not self.questions():
+            return None
+        return self.questions()[self._index_for(user_id, day_number)]
+
+
+scheduler = QuestionScheduler(db)
@@ -0,0 +1,213 @@
+import argparse
+import calendar
+import hashlib
+import json
+import os
+import re
+import shutil
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import moods
+
+# Отчеты о настроении за месяц или год в PNG или PDF: график средней оценки
+# по дням, распределение настроений, основные показатели и избранные
+# комментарии. Данные читаются из базы в основном процессе, а рисование
+# (matplotlib с бэкендом Agg, без окон) идет в пуле процессов.
+# Готовые отчеты хранятся в кэше на диске под ключом - хэшем данных периода,
+# поэтому повторное построение отчета за неизменившийся период ничего не рисует.
+#
+# Запуск: python reports.py (ИМЯ | --all) --year ГОД [--month МЕСЯЦ | --each-month]
+#                           [--format png|pdf] [--output КАТАЛОГ] [--workers N]
+
+FORMATS = ("png", "pdf")
+REPORT_VERSION = 1  # Увеличивается при изменении оформления отчета: старый кэш перестает подходить
+CACHE_DIR = os.path.join('reports', 'cache')
+SELECTED_COMMENTS = 5  # Сколько комментариев лучших и худших записей попадает в отчет
+COMMENT_LENGTH = 200
+
+MONTH_NAMES = ("январь", "февраль", "март", "апрель", "май", "июнь",
+               "июль", "август", "сентябрь", "октябрь", "ноябрь", "декабрь")
+
+
+def period_bounds(year, month=None):
+    # Первый и последний день периода в формате ISO.
+    if month is None:
+        return date(year, 1, 1).isoformat(), date(year, 12, 31).isoformat()
+    return date(year, month, 1).isoformat(), date(year, month, calendar.monthrange(year, month)[1]).isoformat()
+
+
+def file_name(username):
+    # Имя пользователя, пригодное для имени каталога.
+    return re.sub(r'[\\/:*?"<>|\x00-\x1f]', "_", username).strip(". ") or "_"
+
+
+def period_name(year, month=None):
+    return f"{year}" if month is None else f"{year}-{month:02d}"
+
+
+def collect(db, user_id, username, year, month=None, scores=None):
+    # Данные отчета для отрисовки в другом процессе: только простые типы.
+    start, end = period_bounds(year, month)
+    scores = scores or db.get_mood_scores()
+    rows = db.get_moods_between(user_id, start, end)
+    commented = sorted((row for row in rows if row[2]), key=lambda row: scores.get(row[1], 0))
+    best = [row for row in commented[::-1][:SELECTED_COMMENTS] if scores.get(row[1], 0) > 0]
+    worst = [row for row in commented[:SELECTED_COMMENTS] if scores.get(row[1], 0) < 0]
+    title = f"{MONTH_NAMES[month - 1].capitalize()} {year}" if month is not None else f"{year} год"
+    return {
+        "user": username,
+        "title": title,
+        "start": start,
+        "end": end,
+        "dates": [row[0] for row in rows],
+        "scores": [scores.get(row[1], 0) for row in rows],
+        "best": [(entry_date, label, comment[:COMMENT_LENGTH]) for entry_date, label, comment in best],
+        "worst": [(entry_date, label, comment[:COMMENT_LENGTH]) for entry_date, label, comment in worst],
+    }
+
+
+def cache_key(payload, file_format):
+    # Ключ кэша: хэш всех данных отчета, формата и версии оформления.
+    data = json.dumps([REPORT_VERSION, file_format, payload], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def render(payload, path, file_format):
+    # Рисует отчет в файл path; выполняется в процессе пула.
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.dates as mdates
+    import numpy as np
+    from matplotlib.figure import Figure
+
+    import analytics
+
+    days = np.array(payload["dates"], dtype="datetime64[D]").astype(np.int32)
+    series = analytics.MoodSeries(days, np.array(payload["scores"], dtype=np.int8))
+    stats = analytics.summarize(series)
+    day_series = stats["daily"]
+
+    figure = Figure(figsize=(8.27, 11.69))  # A4
+    figure.suptitle(f"Дневник настроения: {payload['user']}, {payload['title']}", fontsize=14)
+    grid = figure.add_gridspec(2, 1, height_ratios=(3, 2), hspace=0.35, left=0.3, right=0.95, top=0.9, bottom=0.47)
+
+    chart = figure.add_subplot(grid[0])
+    chart.set_title("Средняя оценка по дням")
+    chart.xaxis_date()
+    chart.xaxis.set_major_formatter(mdates.DateFormatter("%d.%m"))
+    chart.set_xlim(mdates.date2num(np.datetime64(payload["start"])) - 1,
+                   mdates.date2num(np.datetime64(payload["end"])) + 1)
+    chart.set_ylim(analytics.MIN_SCORE - 0.5, analytics.MAX_SCORE + 0.5)
+    chart.axhline(0, color="black", linewidth=0.8)
+    chart.grid(axis="y")
+    if stats["entries"]:
+        dates = mdates.date2num(np.arange(day_series.first_day, day_series.first_day + len(day_series.mean))
+                                .astype("datetime64[D]"))
+        chart.plot(dates, day_series.mean, marker="o", markersize=3, linewidth=1, label="за день")
+        if len(dates) > 31:
+            chart.plot(dates, stats["rolling_7"], linewidth=2, label="7 дней")
+            chart.legend()
+
+    bars = figure.add_subplot(grid[1])
+    bars.set_title("Распределение настроений")
+    by_score = {mood.score: mood.label for mood in moods.MOODS}
+    scores = range(analytics.MIN_SCORE, analytics.MAX_SCORE + 1)
+    bars.barh([by_score.get(score, str(score)) for score in scores], stats["distribution"])
+    bars.tick_params(axis="y", labelsize=8)
+
+    lines = [f"Записей: {stats['entries']}"]
+    if stats["entries"]:
+        lines += [f"Средняя оценка: {stats['mean']:.2f}",
+                  f"Самая длинная серия хороших дней: {stats['positive_streak']}",
+                  f"Самая длинная серия плохих дней: {stats['negative_streak']}"]
+    for caption, selected in (("Лучшие записи", payload["best"]), ("Трудные записи", payload["worst"])):
+        if selected:
+            lines += ["", f"{caption}:"]
+            for entry_date, label, comment in selected:
+                lines += textwrap.wrap(f"{entry_date} ({label}): {comment}", 110,
+                                       initial_indent="  ", subsequent_indent="    ")
+    text = figure.add_axes((0.08, 0.05, 0.87, 0.38))
+    text.axis("off")
+    text.text(0, 1, "\n".join(lines), va="top", fontsize=8)
+
+    figure.savefig(path, format=file_format)
+    return path
+
+
+def cached_render(payload, file_format, cache_dir=CACHE_DIR):
+    # Путь к готовому отчету в кэше и признак, что его нужно нарисовать.
+    path = os.path.join(cache_dir, f"{cache_key(payload, file_format)}.{file_format}")
+    return path, not os.path.exists(path)
+
+
+def generate_reports(db, jobs, output_dir, file_format="png", workers=None, cache_dir=CACHE_DIR):
+    # Строит отчеты для заданий (user_id, username, year, month); month = None - отчет за год.
+    # Возвращает список (путь к отчету, взят ли он из кэша).
+    os.makedirs(cache_dir, exist_ok=True)
+    scores = db.get_mood_scores()
+    targets = []
+    pending = {}
+    for user_id, username, year, month in jobs:
+        payload = collect(db, user_id, username, year, month, scores)
+        cached, missing = cached_render(payload, file_format, cache_dir)
+        target = os.path.join(output_dir, file_name(username), f"{period_name(year, month)}.{file_format}")
+        targets.append((cached, target))
+        if missing:
+            pending[cached] = payload
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Рисуем во временный файл, чтобы прерванная отрисовка не оставила в кэше битый отчет
+            futures = [pool.submit(render, payload, cached + ".part", file_format)
+                       for cached, payload in pending.items()]
+            for future, cached in zip(futures, pending):
+                os.replace(future.result(), cached)
+
+    results = []
+    for cached, target in targets:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(cached, target)
+        results.append((target, cached not in pending))
+    return results
+
+
+def main(argv=None):
+    from database import db
+
+    parser = argparse.ArgumentParser(description="Отчеты дневника настроения за месяц или год.")
+    who = parser.add_mutually_exclusive_group(required=True)
+    who.add_argument("username", nargs="?", help="имя пользователя")
+    who.add_argument("--all", action="store_true", help="для всех пользователей")
+    parser.add_argument("--year", type=int, default=date.today().year)
+    period = parser.add_mutually_exclusive_group()
+    period.add_argument("--month", type=int, choices=range(1, 13), metavar="МЕСЯЦ")
+    period.add_argument("--each-month", action="store_true", help="отдельный отчет за каждый месяц года")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--output", default="reports", help="каталог для отчетов")
+    parser.add_argument("--workers", type=int, help="число процессов (по умолчанию - по числу ядер)")
+    args = parser.parse_args(argv)
+
+    db.create_tables()
+    if args.all:
+        users = db.get_users()
+    else:
+        user_id = db.get_user_id(args.username)
+        if user_id is None:
+            parser.error(f"пользователь {args.username!r} не найден")
+        users = [(user_id, args.username)]
+    months = range(1, 13) if args.each_month else [args.month]
+    jobs = [(user_id, username, args.year, month) for user_id, username in users for month in months]
+
+    try:
+        results = generate_reports(db, jobs, args.output, args.format, args.workers)
+    except (OSError, ValueError) as e:
+        parser.exit(1, f"Ошибка: {e}\n")
+    for path, from_cache in results:
+        print(f"{path}{' (из кэша)' if from_cache else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import secrets
+from datetime import date
+from urllib.parse import parse_qs, urlsplit
+
+from service import service, DiaryError, InvalidCredentialsError, TooManyAttemptsError, UserExistsError
+
+# Локальный HTTP-сервер с JSON API поверх service.DiaryService. Соединения
+# обслуживает asyncio, а блокирующие обращения к базе выполняются в пуле потоков
+# (asyncio.to_thread), так что много клиентов работают с одной базой одновременно.
+#
+#   POST /register  {"username", "password"}
+#   POST /login     {"username", "password"} -> {"user_id", "token"}
+#   POST /entries   {"mood", "comment", "answer", "date"} (нужен токен)
+#   GET  /history?before_date=&before_id=&limit=        (нужен токен)
+#   GET  /plot                                           (нужен токен)
+#   GET  /question                                       (нужен токен)
+#
+# Токен передается в заголовке "Authorization: Bearer <токен>".
+
+MAX_BODY_SIZE = 1024 * 1024
+
+STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+               409: "Conflict", 413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def text_field(body, name, default=""):
+    # Строковое поле тела запроса; другой тип значения - ошибка 400.
+    value = body.get(name, default)
+    if value is None:
+        return default
+    if not isinstance(value, str):
+        raise HttpError(400, f"Поле {name} должно быть строкой.")
+    return value
+
+
+class DiaryServer:
+
+    def __init__(self, service):
+        self.service = service
+        self.tokens = {}  # токен -> id пользователя (живут, пока работает сервер)
+
+    def user_for(self, headers):
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        user_id = self.tokens.get(token) if scheme.lower() == "bearer" else None
+        if user_id is None:
+            raise HttpError(401, "Требуется вход.")
+        return user_id
+
+    async def route(self, method, path, query, headers, body):
+        # Выполняет запрос и возвращает (статус, объект для JSON).
+        run = asyncio.to_thread
+        if method == "POST" and path == "/register":
+            user_id = await run(self.service.register, text_field(body, "username"), text_field(body, "password"))
+            return 201, {"user_id": user_id}
+        if method == "POST" and path == "/login":
+            user_id = await run(self.service.login, text_field(body, "username"), text_field(body, "password"))
+            token = secrets.token_urlsafe(32)
+            self.tokens[token] = user_id
+            return 200, {"user_id": user_id, "token": token}
+        if method == "POST" and path == "/entries":
+            user_id = self.user_for(headers)
+            entry_date = text_field(body, "date")
+            entry_date = date.fromisoformat(entry_date) if entry_date else None
+            entry_id = await run(self.service.add_entry, user_id, self.service.mood_code(body.get("mood")),
+                                 text_field(body, "comment"), text_field(body, "answer"), entry_date)
+            return 201, {"id": entry_id}
+        if method == "GET" and path == "/history":
+            user_id = self.user_for(headers)
+            before = None
+            if "before_date" in query and "before_id" in query:
+                before = (query["before_date"][0], int(query["before_id"][0]))
+            limit = max(1, min(int(query.get("limit", ["100"])[0]), 1000))
+            rows = await run(self.service.history, user_id, before, limit)
+            return 200, [{"id": row[0], "date": row[1], "mood": row[2], "comment": row[3]} for row in rows]
+        if method == "GET" and path == "/plot":
+            rows = await run(self.service.plot_data, self.user_for(headers))
+            return 200, [{"date": row[0], "mean": row[1]} for row in rows]
+        if method == "GET" and path == "/question":
+            return 200, {"question": await run(self.service.daily_question, self.user_for(headers))}
+        raise HttpError(404, "Нет такого адреса.")
+
+    async def handle_request(self, reader):
+        # Читает один запрос; возвращает (статус, ответ, держать ли соединение) или None, если клиент ушел.
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            return 400, {"error": "Неверный запрос."}, False
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+        # При неверной длине тела нельзя понять, где начнется следующий запрос: закрываем соединение
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return 400, {"error": "Неверный заголовок Content-Length."}, False
+        if length > MAX_BODY_SIZE:
+            return 413, {"error": "Слишком большой запрос."}, False
+        try:
+            raw_body = await reader.readexactly(length) if length else b""
+        except asyncio.IncompleteReadError:
+            return None  # Клиент закрыл соединение, не отправив тело
+
+        url = urlsplit(target)
+        try:
+            body = json.loads(raw_body) if raw_body else {}
+            if not isinstance(body, dict):
+                raise HttpError(400, "Тело запроса должно быть объектом JSON.")
+            status, payload = await self.route(method, url.path, parse_qs(url.query), headers, body)
+        except HttpError as e:
+            status, payload = e.status, {"error": str(e)}
+        except TooManyAttemptsError as e:
+            status, payload = 429, {"error": str(e), "retry_after": e.retry_after}
+        except InvalidCredentialsError as e:
+            status, payload = 401, {"error": str(e)}
+        except UserExistsError as e:
+            status, payload = 409, {"error": str(e)}
+        except (DiaryError, ValueError, KeyError) as e:
+            status, payload = 400, {"error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"error": f"Внутренняя ошибка: {e}"}
+        return status, payload, keep_alive
+
+    async def handle_connection(self, reader, writer):
+        # Обслуживает соединение; поддерживает keep-alive для HTTP/1.1.
+        try:
+            while True:
+                result = await self.handle_request(reader)
+                if result is None:
+                    break
+                status, payload, keep_alive = result
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host="127.0.0.1", port=8765):
+    # Запускает сервер и обслуживает запросы до остановки процесса.
+    server = await asyncio.start_server(DiaryServer(service).handle_connection, host, port)
+    print(f"Сервер дневника настроения: http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,186 @@
+import sqlite3
+from datetime import date
+
+from cache import SummaryCache
+from config import settings
+import credentials
+from database import db
+import moods
+from questions import scheduler
+import transfer
+from writer import WriteBehindQueue
+
+# Операции дневника без привязки к интерфейсу: их используют окна PyQt6,
+# командная строка (cli.py) и HTTP-сервер (server.py).
+
+
+class DiaryError(Exception):
+    # Базовая ошибка операций дневника; текст ошибки можно показывать пользователю.
+    pass
+
+
+class ValidationError(DiaryError):
+    pass
+
+
+class UserExistsError(DiaryError):
+    pass
+
+
+class InvalidCredentialsError(DiaryError):
+    pass
+
+
+class TooManyAttemptsError(DiaryError):
+
+    def __init__(self, retry_after):
+        super().__init__(f"Слишком много попыток входа. Повторите через {int(retry_after) + 1} с.")
+        self.retry_after = retry_after
+
+
+class DiaryService:
+
+    def __init__(self, db, scheduler, limiter):
+        self.db = db
+        self.scheduler = scheduler
+        self.limiter = limiter
+        self.writer = WriteBehindQueue(db)
+        self.cache = SummaryCache(db.get_data_version, settings.cache_max_entries, settings.cache_max_rows)
+
+    def prepare(self):
+        # Применяет недостающие миграции схемы; возвращает версию схемы.
+        return self.db.create_tables()
+
+    # --- Пользователи ---
+
+    def register(self, username, password):
+        # Регистрирует пользователя и возвращает его id.
+        if not username or not password:
+            raise ValidationError("Пожалуйста, заполните все поля.")
+        try:
+            return credentials.create_user(self.db, username, password)
+        except sqlite3.IntegrityError:
+            raise UserExistsError("Пользователь с таким именем уже существует.") from None
+
+    def login(self, username, password):
+        # Проверяет логин и пароль с учетом ограничения попыток; возвращает id пользователя.
+        if not username or not password:
+            raise ValidationError("Пожалуйста, заполните все поля.")
+        retry_after = self.limiter.retry_after(username)
+        if retry_after > 0:
+            raise TooManyAttemptsError(retry_after)
+
+        user_id = credentials.authenticate(self.db, username, password)
+        if user_id is None:
+            self.limiter.record_failure(username)
+            raise InvalidCredentialsError("Неверное имя пользователя или пароль.")
+        self.limiter.reset(username)
+        return user_id
+
+    def start_session(self, user_id):
+        # Запоминает вход пользователя; возвращает токен для сохранения на устройстве.
+        return credentials.create_session(self.db, user_id, settings.session_days)
+
+    def resume_session(self, token):
+        # id пользователя по сохраненному токену или None.
+        return credentials.resume_session(self.db, token)
+
+    def end_session(self, token):
+        credentials.end_session(self.db, token)
+
+    def user_id(self, username):
+        # id пользователя по имени (для командной строки); ошибка, если его нет.
+        user_id = self.db.get_user_id(username)
+        if user_id is None:
+            raise DiaryError(f"Пользователь {username!r} не найден.")
+        return user_id
+
+    # --- Записи ---
+
+    @staticmethod
+    def mood_code(value):
+        # Код настроения по коду (число или строка с числом) или по названию.
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            mood = None
+        elif isinstance(value, int) or value.isdigit():
+            mood = moods.BY_CODE.get(int(value))
+        else:
+            mood = moods.BY_LABEL.get(value)
+        if mood is None:
+            raise ValidationError(f"Неизвестное настроение: {value!r}.")
+        return mood.code
+
+    def queue_entry(self, user_id, mood_code, comment="", answer="", entry_date=None):
+        # Ставит запись о настроении в очередь записи и сразу возвращает Future с id записи.
+        # entry_date - datetime.date, по умолчанию сегодня. Запись видна в истории
+        # после того, как Future выполнен (или после flush()).
+        if mood_code not in moods.BY_CODE:
+            raise ValidationError("Пожалуйста, выберите настроение.")
+        entry_date = (entry_date or date.today()).isoformat()
+        return self.writer.submit((user_id, mood_code, comment, answer, entry_date))
+
+    def add_entry(self, user_id, mood_code, comment="", answer="", entry_date=None, clear_draft=False):
+        # Добавляет запись и ждет ее фиксации; возвращает id записи.
+        # С clear_draft=True после сохранения удаляется черновик пользователя.
+        mood_id = self.queue_entry(user_id, mood_code, comment, answer, entry_date).result()
+        if clear_draft:
+            self.db.delete_draft(user_id)
+        return mood_id
+
+    def flush(self):
+        # Ждет записи всех поставленных в очередь записей.
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+    def save_draft(self, user_id, mood_code, comment, answer):
+        # Сохраняет черновик записи; пустой черновик удаляется.
+        if mood_code is None and not comment and not answer:
+            self.db.delete_draft(user_id)
+        else:
+            self.db.save_draft(user_id, mood_code, comment, answer)
+
+    def load_draft(self, user_id):
+        # Черновик (mood_code, comment, answer) или None.
+        return self.db.get_draft(user_id)
+
+    def export_entries(self, user_id, path, file_format=None, progress=None):
+        # Выгружает все записи пользователя в файл (см. transfer.export_moods); возвращает их число.
+        return transfer.export_moods(self.db, user_id, path, file_format, progress)
+
+    def import_entries(self, user_id, path, file_format=None, progress=None):
+        # Загружает записи из файла (см. transfer.import_moods); возвращает их число.
+        return transfer.import_moods(self.db, user_id, path, file_format, progress)
+
+    # Результаты чтения кэшируются до следующего изменения записей пользователя
+
+    def history(self, user_id, before=None, limit=100):
+        # Страница истории от новых записей к старым: строки (id, date, mood, comment).
+        return self.cache.get(user_id, "history", (before, limit),
+                              lambda: self.db.get_history_page(user_id, before, limit))
+
+    def plot_data(self, user_id):
+        # Средняя оценка по дням: строки (date, mean).
+        return self.cache.get(user_id, "plot", (), lambda: self.db.get_daily_means(user_id))
+
+    def statistics(self, user_id):
+        # Сводная статистика (см. analytics.summarize); numpy загружается только здесь.
+        import analytics
+
+        return self.cache.get(user_id, "statistics", (),
+                              lambda: analytics.summarize(analytics.load_series(self.db, user_id)))
+
+    def search(self, user_id, text, mood_code=None, start=None, end=None, limit=50, offset=0):
+        return self.db.search_moods(user_id, text, mood_code, start, end, limit, offset)
+
+    def archived_years(self):
+        # Годы, перенесенные в архив (см. archive.py): поиск по ним не идет.
+        return [year for year, *_ in self.db.get_archives()]
+
+    def daily_question(self, user_id):
+        # Не зависит от записей; на текущий день кэшируется самим планировщиком.
+        return self.scheduler.question_for(user_id)
+
+
+service = DiaryService(db, scheduler, credentials.login_limiter)
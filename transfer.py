@@ -0,0 +1,131 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import date
+from itertools import islice
+
+# Импорт и экспорт записей о настроении в CSV и JSONL. Записи читаются и пишутся
+# потоком (курсор - генератор, вставка - пакетами executemany в одной
+# транзакции), поэтому расход памяти не зависит от числа записей.
+
+FIELDS = ("date", "mood", "comment", "question_answer")
+FORMATS = ("csv", "jsonl")
+BATCH_SIZE = 1000
+
+
+def detect_format(path):
+    # Формат по расширению файла: .csv или .jsonl / .json.
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".json"):
+        return "jsonl"
+    raise ValueError(f"Не удалось определить формат файла {path}: ожидается .csv или .jsonl")
+
+
+def export_moods(db, user_id, path, file_format=None, progress=None):
+    # Выгружает все записи пользователя в файл; возвращает число записей.
+    file_format = file_format or detect_format(path)
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        if file_format == "csv":
+            writer = csv.writer(file)
+            writer.writerow(FIELDS)
+            write = writer.writerow
+        else:
+            def write(row):
+                file.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n")
+
+        for row in db.iter_moods(user_id):
+            write(row)
+            count += 1
+            if progress is not None and count % BATCH_SIZE == 0:
+                progress(count)
+    if progress is not None:
+        progress(count)
+    return count
+
+
+def read_records(path, file_format=None):
+    # Генератор записей из файла: словари с полями FIELDS и номером строки.
+    file_format = file_format or detect_format(path)
+    with open(path, encoding="utf-8", newline="") as file:
+        if file_format == "csv":
+            for line_number, record in enumerate(csv.DictReader(file), 2):
+                yield line_number, record
+        else:
+            for line_number, line in enumerate(file, 1):
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except ValueError as e:
+                        raise ValueError(f"Строка {line_number}: неверный JSON ({e})") from None
+                    yield line_number, record
+
+
+def to_rows(user_id, records, mood_codes):
+    # Проверяет записи и превращает их в строки для вставки в moods.
+    for line_number, record in records:
+        if not isinstance(record, dict):
+            raise ValueError(f"Строка {line_number}: ожидается объект с полями {', '.join(FIELDS)}")
+        for field in FIELDS:
+            value = record.get(field)
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"Строка {line_number}: поле {field} должно быть строкой, а не {value!r}")
+        mood_code = mood_codes.get(record.get("mood"))
+        if mood_code is None:
+            raise ValueError(f"Строка {line_number}: неизвестное настроение {record.get('mood')!r}")
+        try:
+            entry_date = date.fromisoformat(record.get("date") or "").isoformat()
+        except ValueError:
+            raise ValueError(f"Строка {line_number}: неверная дата {record.get('date')!r}, "
+                             "ожидается ГГГГ-ММ-ДД") from None
+        yield (user_id, mood_code, record.get("comment") or "", record.get("question_answer") or "", entry_date)
+
+
+def import_moods(db, user_id, path, file_format=None, progress=None):
+    # Загружает записи из файла одной транзакцией; при ошибке в любой строке
+    # не добавляется ничего. Возвращает число добавленных записей.
+    rows = to_rows(user_id, read_records(path, file_format), db.get_mood_codes())
+    count = 0
+    with db.transaction() as conn:
+        while batch := list(islice(rows, BATCH_SIZE)):
+            db.insert_moods(conn, batch)
+            count += len(batch)
+            if progress is not None:
+                progress(count)
+    return count
+
+
+def main(argv=None):
+    from database import db
+
+    parser = argparse.ArgumentParser(description="Импорт и экспорт записей дневника настроения.")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("username", help="имя пользователя")
+    parser.add_argument("path", help="файл .csv или .jsonl")
+    parser.add_argument("--format", choices=FORMATS, help="формат файла (по умолчанию - по расширению)")
+    args = parser.parse_args(argv)
+
+    db.create_tables()
+    user_id = db.get_user_id(args.username)
+    if user_id is None:
+        parser.error(f"пользователь {args.username!r} не найден")
+
+    def progress(count):
+        print(f"\r{count} записей", end="", file=sys.stderr, flush=True)
+
+    action = export_moods if args.command == "export" else import_moods
+    try:
+        count = action(db, user_id, args.path, args.format, progress)
+    except (OSError, ValueError) as e:
+        print(file=sys.stderr)
+        parser.exit(1, f"Ошибка: {e}\n")
+    print(file=sys.stderr)
+    print(f"{'Выгружено' if args.command == 'export' else 'Загружено'} записей: {count}")
+
+
+if __name__ == "__main__":
+    main()
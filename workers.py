@@ -0,0 +1,105 @@
+import time
+import traceback
+
+from PyQt6 import QtCore
+
+from instrumentation import metrics, task_name
+
+
+class TaskSignals(QtCore.QObject):
+    # Сигналы задачи; объект создается в потоке интерфейса, поэтому
+    # обработчики вызываются в нем же, а не в рабочем потоке.
+    result = QtCore.pyqtSignal(object)
+    error = QtCore.pyqtSignal(object)
+    progress = QtCore.pyqtSignal(object)
+    finished = QtCore.pyqtSignal()  # после result или error, а также для отмененной задачи
+
+
+class Task(QtCore.QRunnable):
+    # Задача для пула потоков: вызывает функцию и передает результат сигналом.
+
+    def __init__(self, func, *args, **kwargs):
+        super().__init__()
+        # Объект задачи удаляет Python, а не Qt: TaskGroup держит ссылку до
+        # сигнала finished и может обращаться к уже выполненной задаче.
+        self.setAutoDelete(False)
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        # Отмена не прерывает уже выполняющийся запрос, но результат не будет доставлен.
+        self.cancelled = True
+
+    def run(self):
+        if self.cancelled:
+            self.signals.finished.emit()
+            return
+        start = time.perf_counter()
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.error.emit(e)
+        else:
+            self.signals.result.emit(result)
+        finally:
+            if metrics.enabled:
+                metrics.record(f"task.{task_name(self.func)}", time.perf_counter() - start)
+            self.signals.finished.emit()
+
+
+def print_error(error):
+    # Обработчик ошибок по умолчанию: печатает трассировку.
+    traceback.print_exception(error)
+
+
+class TaskGroup(QtCore.QObject):
+    # Фоновые задачи окна. Все они отменяются, когда окно-владелец закрывается.
+
+    def __init__(self, owner=None, pool=None):
+        super().__init__(owner)
+        self.pool = pool or QtCore.QThreadPool.globalInstance()
+        self.tasks = set()
+        if owner is not None:
+            owner.installEventFilter(self)
+
+    def start(self, func, *args, on_result=None, on_error=print_error, on_progress=None):
+        # Запускает func(*args) в пуле потоков; on_result и on_error вызываются в потоке интерфейса.
+        # Если задан on_progress, func получает аргумент progress - функцию для
+        # отчета о ходе работы из рабочего потока.
+        if on_progress is None:
+            task = Task(func, *args)
+        else:
+            task = Task(func, *args, progress=lambda value: task.signals.progress.emit(value))
+            task.signals.progress.connect(lambda value: self._report(task, on_progress, value))
+        task.signals.result.connect(lambda value: self._deliver(task, on_result, value))
+        task.signals.error.connect(lambda error: self._deliver(task, on_error, error))
+        task.signals.finished.connect(lambda: self.tasks.discard(task))
+        self.tasks.add(task)
+        self.pool.start(task)
+        return task
+
+    def _deliver(self, task, callback, value):
+        # Проверка отмены выполняется в потоке интерфейса, поэтому результат,
+        # пришедший после закрытия окна, гарантированно отбрасывается.
+        if not task.cancelled and callback is not None:
+            callback(value)
+
+    def _report(self, task, callback, value):
+        if not task.cancelled:
+            callback(value)
+
+    def cancel_all(self):
+        # Еще не начатые задачи убираются из очереди; начатые остаются в tasks
+        # до сигнала finished, чтобы объект задачи жил, пока ее выполняет пул.
+        for task in list(self.tasks):
+            task.cancel()
+            if self.pool.tryTake(task):
+                self.tasks.discard(task)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Type.Close:
+            self.cancel_all()
+        return False
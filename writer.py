@@ -0,0 +1,101 @@
+import atexit
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+# Отложенная запись (write-behind): новые записи о настроении ставятся в очередь,
+# а отдельный поток записывает их пачками - все, что накопилось, пока шла
+# предыдущая транзакция, уходит одной транзакцией. Одиночная запись не ждет
+# таймера, а при потоке вставок (сервер, скрипты) число транзакций падает
+# во много раз.
+
+MAX_BATCH = 1000
+
+_INSERT, _FLUSH, _STOP = range(3)
+
+
+class WriteBehindQueue:
+
+    def __init__(self, db, max_batch=MAX_BATCH):
+        self.db = db
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _put(self, kind, row=None):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Очередь записи закрыта")
+            if self._thread is None:
+                # Поток запускается при первой записи; при выходе очередь дописывается
+                self._thread = threading.Thread(target=self._run, name="mood-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            self._queue.put((kind, row, future))
+        return future
+
+    def submit(self, row):
+        # Ставит строку (user_id, mood_id, comment, question_answer, date) в очередь.
+        # Возвращает Future, который получит id записи после фиксации транзакции.
+        return self._put(_INSERT, row)
+
+    def flush(self):
+        # Ждет, пока будут записаны все строки, поставленные в очередь до вызова.
+        if self._thread is not None:
+            self._put(_FLUSH).result()
+
+    def close(self):
+        # Дописывает очередь и останавливает поток записи.
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._thread is None:
+                return
+            self._queue.put((_STOP, None, Future()))
+        self._thread.join()
+
+    def _take_batch(self):
+        # Ждет первый элемент, затем забирает без ожидания все, что уже накопилось.
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            self._write(batch)
+            if any(kind == _STOP for kind, _, _ in batch):
+                return
+
+    def _write(self, batch):
+        inserts = [(row, future) for kind, row, future in batch if kind == _INSERT]
+        results = []
+        try:
+            if inserts:
+                with self.db.transaction() as conn:
+                    for row, future in inserts:
+                        try:
+                            results.append((future, self.db.insert_mood(conn, row)))
+                        except sqlite3.Error as e:
+                            # Ошибочная строка не мешает остальным: SQLite откатывает только ее
+                            future.set_exception(e)
+        except Exception as e:
+            # Транзакция не началась или не зафиксирована: ни одна строка пачки не записана
+            for _, future in inserts:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future, mood_id in results:
+                future.set_result(mood_id)
+        for kind, _, future in batch:
+            if kind != _INSERT:
+                future.set_result(None)